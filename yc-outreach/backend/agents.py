@@ -1,194 +1,352 @@
+import os
 import json
 import re
 import httpx
 import asyncio
+import time
 from datetime import datetime, timedelta
 from urllib.parse import urlparse, quote
-from database import get_db
+from database import db_read, db_write
 from scraper import scrape_all
+from scoring import rescore_companies, score_companies
+from ratelimit import HostRateLimiter, GitHubBudget, BudgetExhausted
+from http_cache import conditional_get, get_cache
+from log_sink import get_log_sink, flush_logs, compact_agent_logs
+from jobs import report_progress, run_exclusive
+from events import publish
+from email_generator import generate_emails, draft_key, format_draft
+from draft_cache import store_drafts
+from profile_parser import parse_page, parse_oss
+
+# Companies enriched at once; per-host politeness comes from HostRateLimiter
+RECON_CONCURRENCY = int(os.environ.get("RECON_CONCURRENCY", "8"))
+
+# Seconds a recon lookup is reused without asking the server again, per source
+RECON_CACHE_TTLS = {
+    "yc_oss": 7 * 86400,
+    "yc_page": 3 * 86400,
+    "github_search": 86400,
+    "github_user": 3 * 86400,
+}
+RECON_NEGATIVE_TTL = 86400  # for 404s, any source
+RECON_CACHE_MAX_BYTES = int(os.environ.get("RECON_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Top-scored companies recon looks at per run
+RECON_TARGETS = 100
+
+# Scout hands companies scoring at least this to recon while it is still scraping
+RECON_STREAM_MIN_SCORE = int(os.environ.get("RECON_STREAM_MIN_SCORE", "50"))
+# Companies that may wait between scout and recon; more are left to recon's own selection
+RECON_STREAM_QUEUE = 50
+
+# stage -> stages it waits for. Recon also reads scout's stream, so it starts with scout.
+PIPELINE = {
+    "scout": (),
+    "recon": (),
+    "writer": ("recon",),
+    "tracker": (),
+}
+
+# Companies the writer keeps drafts for, best relevance_score first
+WRITER_TARGETS = int(os.environ.get("WRITER_TARGETS", "100"))
+# Companies rendered between progress reports
+WRITER_CHUNK = 50
+
+TARGET_COLUMNS = "c.id, c.name, c.website, c.slug, c.batch, c.yc_url, c.contact_count, c.relevance_score"
+
+
+def end_stream(stream: asyncio.Queue):
+    """Put the end marker on scout's stream, making room if recon has stopped reading."""
+    while True:
+        try:
+            stream.put_nowait(None)
+            return
+        except asyncio.QueueFull:
+            stream.get_nowait()
 
 
-async def log_action(db, agent_name: str, action: str, details: str, company_id: int = None, status: str = "info"):
-    await db.execute(
-        "INSERT INTO agent_logs (agent_name, action, details, company_id, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-        (agent_name, action, details, company_id, status, datetime.utcnow().isoformat())
-    )
-    await db.commit()
+async def log_action(agent_name: str, action: str, details: str, company_id: int = None, status: str = "info"):
+    """Queue an agent_logs row, which the log sink writes in batches, and stream it to live clients."""
+    publish("log", agent_name=agent_name, action=action, details=details, company_id=company_id,
+            status=status, created_at=datetime.utcnow().isoformat())
+    await get_log_sink().put(agent_name, action, details, company_id, status)
 
 
 class ScoutAgent:
     name = "scout"
 
-    async def run(self) -> dict:
-        db = await get_db()
-        await log_action(db, self.name, "start", "Starting scout agent — scraping YC companies")
+    async def run(self, stream: asyncio.Queue = None) -> dict:
+        """Scrape and score. With `stream`, each written chunk is scored as it lands and
+        companies scoring RECON_STREAM_MIN_SCORE or more go on the stream for recon;
+        the caller ends it with end_stream()."""
+        self.stream = stream
+        self.streamed = 0
+        await log_action(self.name, "start", "Starting scout agent — scraping YC companies")
 
+        # scrape_all checks out the writer itself, so don't hold it here
+        await report_progress(agent=self.name, stage="scout:scrape")
         try:
-            count = await scrape_all()
-            await log_action(db, self.name, "scrape_complete", f"Scraped {count} companies", status="success")
+            scrape = await scrape_all(on_written=self._stream_chunk if self.stream is not None else None)
         except Exception as e:
-            await log_action(db, self.name, "scrape_error", str(e), status="error")
-            await db.close()
+            await log_action(self.name, "scrape_error", str(e), status="error")
+            await flush_logs()
             return {"error": str(e), "scored": 0}
 
-        # Re-open db since scrape_all closes it
-        db = await get_db()
-
-        # Score all companies
-        cursor = await db.execute("SELECT id, name, industries, tags, locations, is_hiring, team_size, one_liner, long_description FROM companies")
-        companies = [dict(r) for r in await cursor.fetchall()]
-
-        scored = 0
-        for c in companies:
-            score = self._score(c)
-            await db.execute("UPDATE companies SET relevance_score = ? WHERE id = ?", (score, c["id"]))
-            scored += 1
-
-        await db.commit()
-        await log_action(db, self.name, "scoring_complete", f"Scored {scored} companies by relevance", status="success")
-        await db.close()
-        return {"scraped": count, "scored": scored}
-
-    def _score(self, c: dict) -> int:
-        score = 0
-        text = " ".join([
-            c.get("industries") or "",
-            c.get("tags") or "",
-            c.get("one_liner") or "",
-            c.get("long_description") or "",
-        ]).lower()
-
-        # +30 AI/ML keywords
-        ai_keywords = ["artificial intelligence", "machine learning", "deep learning", "nlp",
-                        "natural language", "llm", "large language model", "computer vision",
-                        "neural network", "generative ai", "\"ai\"", " ai ", " ai,", " ml ",
-                        "ai-", "ml-", "ai/ml"]
-        if any(k in text for k in ai_keywords):
-            score += 30
-
-        # +20 if hiring
-        if c.get("is_hiring"):
-            score += 20
-
-        # +15 location
-        locs = (c.get("locations") or "").lower()
-        if any(k in locs for k in ["nyc", "new york", "remote"]):
-            score += 15
-
-        # +10 team size sweet spot
-        ts = c.get("team_size") or 0
-        if 2 <= ts <= 50:
-            score += 10
-
-        # +5 dev tools / infra / SaaS
-        infra_keywords = ["developer tools", "devtools", "infrastructure", "saas", "platform",
-                          "api", "sdk", "cloud", "dev tool"]
-        if any(k in text for k in infra_keywords):
-            score += 5
-
-        return score
+        await log_action(
+            self.name, "scrape_complete",
+            f"Scraped {scrape['total']} companies ({scrape['inserted']} new, {scrape['updated']} changed, "
+            f"{scrape['unchanged']} unchanged, {scrape['removed']} removed)"
+            + (f", {self.streamed} passed to recon early" if self.stream is not None else ""),
+            status="success",
+        )
+
+        # Features only for new or changed companies, then re-rank everyone in SQL
+        await report_progress(agent=self.name, stage="scout:scoring")
+        scoring = await rescore_companies()
+        await log_action(
+            self.name, "scoring_complete",
+            f"Scored {scoring['scored']} companies by relevance ({scoring['changed']} changed, "
+            f"{scoring['features_computed']} re-read) "
+            f"in {scoring['seconds']}s, {scoring['per_second']}/s",
+            status="success",
+        )
+        await flush_logs()
+        return {"scraped": scrape["total"], "streamed": self.streamed, **scoring}
+
+    async def _stream_chunk(self, ids: list):
+        if self.streamed >= RECON_TARGETS:
+            return
+        scores = await score_companies(ids)
+        hot = [cid for cid, score in scores.items() if score >= RECON_STREAM_MIN_SCORE]
+        if not hot:
+            return
+        async with db_read() as db:
+            cursor = await db.execute(
+                f"SELECT {TARGET_COLUMNS} FROM companies c WHERE c.id IN ({','.join('?' * len(hot))}) "
+                f"ORDER BY c.relevance_score DESC",
+                hot,
+            )
+            companies = [dict(r) for r in await cursor.fetchall()]
+        for c in companies[:RECON_TARGETS - self.streamed]:
+            # Never wait on recon: what doesn't fit is picked up by its own top-N selection
+            try:
+                self.stream.put_nowait(c)
+            except asyncio.QueueFull:
+                break
+            self.streamed += 1
 
 
 class ReconAgent:
     name = "recon"
 
-    async def run(self) -> dict:
-        db = await get_db()
-        await log_action(db, self.name, "start", "Starting recon agent — enriching contacts via YC profiles, GitHub, email patterns, LinkedIn")
-
-        # Get top companies by relevance_score, skip those with 2+ contacts already
-        cursor = await db.execute("""
-            SELECT c.id, c.name, c.website, c.slug, c.batch, c.yc_url,
-                   (SELECT COUNT(*) FROM contacts ct WHERE ct.company_id = c.id) as contact_count
-            FROM companies c
-            WHERE c.relevance_score > 0
-            ORDER BY c.relevance_score DESC
-            LIMIT 100
-        """)
-        all_companies = [dict(r) for r in await cursor.fetchall()]
-
-        # Filter out companies that already have 2+ contacts
-        companies = [c for c in all_companies if c["contact_count"] < 2]
-
-        if not companies:
-            await log_action(db, self.name, "no_targets", "No companies to enrich (all have 2+ contacts or no scored companies)", status="info")
-            await db.close()
-            return {"enriched": 0, "new_contacts": 0}
-
-        await log_action(db, self.name, "targets_found", f"Found {len(companies)} companies to enrich (of {len(all_companies)} top-scored)")
-
-        enriched_count = 0
-        total_new_contacts = 0
-        github_request_count = 0
-        MAX_GITHUB_REQUESTS = 50  # Stay well under 60/hr limit
+    async def run(self, stream: asyncio.Queue = None) -> dict:
+        """Enrich the top-scored companies. With `stream`, companies scout puts on it
+        are enriched as they arrive, and the top-N selection runs once it ends."""
+        await log_action(self.name, "start", "Starting recon agent — enriching contacts via YC profiles, GitHub, email patterns, LinkedIn")
+
+        checked = set()
+        if stream is None:
+            all_companies, companies = await self._select_targets(checked)
+            if not companies:
+                await log_action(self.name, "no_targets", "No companies to enrich (all have 2+ contacts or no scored companies)", status="info")
+                await flush_logs()
+                return {"enriched": 0, "new_contacts": 0}
+            await log_action(self.name, "targets_found", f"Found {len(companies)} companies to enrich (of {len(all_companies)} top-scored)")
+            self.contact_keys = await self._load_contact_keys([c["id"] for c in companies])
+        else:
+            self.contact_keys = {}
+
+        self.limiter = HostRateLimiter()
+        self.cache = get_cache("recon", max_bytes=RECON_CACHE_MAX_BYTES)
+        cache_before = dict(self.cache.counters)
+        self.budget = GitHubBudget()
+        self.github_requests = 0
+        sem = asyncio.Semaphore(RECON_CONCURRENCY)
+        done = found = total = 0
+        started = time.monotonic()
+
+        async def enrich(c):
+            nonlocal done, found
+            async with sem:
+                added = await self._enrich_company(client, c)
+            done += 1
+            found += added
+            rate = done / (time.monotonic() - started)
+            await report_progress(agent=self.name, companies_done=done, contacts_found=found,
+                                  eta_s=round((total - done) / rate) if rate else None)
+            return added
 
         async with httpx.AsyncClient(timeout=15, follow_redirects=True, headers={"User-Agent": "Mozilla/5.0 (compatible; YCOutreach/1.0)"}) as client:
-            for c in companies:
-                company_new_contacts = 0
-                domain = self._extract_domain(c.get("website") or "")
-                founders_found = []  # Track names found for email pattern generation
-
-                # --- Source 1: YC Profile Scraping ---
-                try:
-                    yc_contacts = await self._scrape_yc_profile(client, c, db)
-                    for contact in yc_contacts:
-                        if await self._insert_contact_if_new(db, c["id"], contact):
-                            company_new_contacts += 1
-                            founders_found.append(contact)
-                    if yc_contacts:
-                        await log_action(db, self.name, "yc_profile", f"Found {len(yc_contacts)} contacts from YC profile for {c['name']}", c["id"], "success")
-                    await asyncio.sleep(1.5)
-                except Exception as e:
-                    await log_action(db, self.name, "yc_profile_error", f"YC profile failed for {c['name']}: {str(e)[:200]}", c["id"], "error")
-
-                # --- Source 2: GitHub Search ---
-                if github_request_count < MAX_GITHUB_REQUESTS:
-                    try:
-                        gh_contacts, gh_reqs = await self._search_github(client, c, domain)
-                        github_request_count += gh_reqs
-                        for contact in gh_contacts:
-                            if await self._insert_contact_if_new(db, c["id"], contact):
-                                company_new_contacts += 1
-                                founders_found.append(contact)
-                        if gh_contacts:
-                            await log_action(db, self.name, "github", f"Found {len(gh_contacts)} contacts from GitHub for {c['name']}", c["id"], "success")
-                        await asyncio.sleep(1.5)
-                    except Exception as e:
-                        await log_action(db, self.name, "github_error", f"GitHub search failed for {c['name']}: {str(e)[:200]}", c["id"], "error")
-
-                # --- Source 3: Email Pattern Generator ---
-                if domain and founders_found:
-                    try:
-                        email_contacts = self._generate_email_patterns(founders_found, domain, c["name"])
-                        for contact in email_contacts:
-                            if await self._insert_contact_if_new(db, c["id"], contact):
-                                company_new_contacts += 1
-                        if email_contacts:
-                            await log_action(db, self.name, "email_pattern", f"Generated {len(email_contacts)} email patterns for {c['name']}", c["id"], "success")
-                    except Exception as e:
-                        await log_action(db, self.name, "email_pattern_error", f"Email pattern failed for {c['name']}: {str(e)[:200]}", c["id"], "error")
-                # No generic fallback — only generate patterns for known founders
-
-                # --- Source 4: LinkedIn URL Generator ---
-                try:
-                    linkedin_contacts = self._generate_linkedin_urls(founders_found, c["name"], c.get("slug", ""))
-                    for contact in linkedin_contacts:
-                        if await self._insert_contact_if_new(db, c["id"], contact):
-                            company_new_contacts += 1
-                    if linkedin_contacts:
-                        await log_action(db, self.name, "linkedin", f"Generated {len(linkedin_contacts)} LinkedIn URLs for {c['name']}", c["id"], "success")
-                except Exception as e:
-                    await log_action(db, self.name, "linkedin_error", f"LinkedIn URL gen failed for {c['name']}: {str(e)[:200]}", c["id"], "error")
-
-                if company_new_contacts > 0:
-                    enriched_count += 1
-                    total_new_contacts += company_new_contacts
-                    await db.commit()
-
-        summary = f"Enriched {enriched_count} companies, found {total_new_contacts} new contacts (GitHub requests used: {github_request_count})"
-        await log_action(db, self.name, "complete", summary, status="success")
-        await db.close()
-        return {"enriched": enriched_count, "new_contacts": total_new_contacts, "companies_checked": len(companies)}
+            tasks = []
+            try:
+                if stream is not None:
+                    await report_progress(agent=self.name, stage="recon:stream", companies_done=0, companies_total=0,
+                                          contacts_found=0)
+                    while (c := await stream.get()) is not None:
+                        if c["id"] in checked or c["contact_count"] >= 2:
+                            continue
+                        checked.add(c["id"])
+                        total += 1
+                        self.contact_keys.update(await self._load_contact_keys([c["id"]]))
+                        tasks.append(asyncio.create_task(enrich(c)))
+                    # Scout is done and the ranking final: the rest of the top N
+                    all_companies, companies = await self._select_targets(checked)
+                    await log_action(self.name, "targets_found",
+                                     f"Found {len(companies)} more companies to enrich (of {len(all_companies)} top-scored) "
+                                     f"after {len(checked)} from scout's stream")
+                    self.contact_keys.update(await self._load_contact_keys([c["id"] for c in companies]))
+                total += len(companies)
+                await report_progress(agent=self.name, stage="recon", companies_done=done, companies_total=total,
+                                      contacts_found=found)
+                tasks.extend(asyncio.create_task(enrich(c)) for c in companies)
+                counts = await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        self.cache.flush()
+        cache = {k: v - cache_before[k] for k, v in self.cache.counters.items()}
+        served = cache["hits"] + cache["revalidated"]
+        hit_rate = f"{served / cache['requests']:.0%}" if cache["requests"] else "n/a"
+
+        enriched_count = sum(1 for n in counts if n)
+        total_new_contacts = sum(counts)
+        budget = ", ".join(f"{k} {v['remaining']}/{v['limit']}" for k, v in (await self.budget.snapshot()).items())
+        summary = (f"Enriched {enriched_count} companies, found {total_new_contacts} new contacts "
+                   f"(GitHub requests used: {self.github_requests}, budget left: {budget or 'n/a'}; "
+                   f"host requests: {self.limiter.stats()})")
+        await log_action(
+            self.name, "cache",
+            f"Lookup cache: {cache['hits']} hits, {cache['revalidated']} revalidated, {cache['misses']} misses "
+            f"({hit_rate} served from cache), {cache['evictions']} evicted",
+        )
+        await log_action(self.name, "complete", summary, status="success")
+        await flush_logs()
+        return {"enriched": enriched_count, "new_contacts": total_new_contacts, "companies_checked": total,
+                "streamed": len(checked), "cache": cache}
+
+    async def _select_targets(self, exclude: set) -> tuple:
+        """(top RECON_TARGETS by relevance_score, those of them with under 2 contacts and not in `exclude`)."""
+        async with db_read() as db:
+            cursor = await db.execute(f"""
+                SELECT {TARGET_COLUMNS}
+                FROM companies c
+                WHERE c.relevance_score > 0
+                ORDER BY c.relevance_score DESC
+                LIMIT ?
+            """, (RECON_TARGETS,))
+            all_companies = [dict(r) for r in await cursor.fetchall()]
+        return all_companies, [c for c in all_companies if c["contact_count"] < 2 and c["id"] not in exclude]
+
+    async def _get(self, client: httpx.AsyncClient, source: str, url: str, priority: float = 0, **kwargs):
+        """GET through the lookup cache, then the host rate limiter on a miss.
+
+        Requests that reach GitHub also need the shared GitHub budget, which
+        is handed out highest `priority` first. When it runs out, a stale
+        cached copy is better than nothing; without one BudgetExhausted
+        propagates.
+        """
+        async def fetch(url, **kw):
+            if not source.startswith("github"):
+                return await self.limiter.get(client, url, **kw)
+            resource = self.budget.resource(url)
+            async with self.budget.turn(priority):
+                if not await self.budget.reserve(resource):
+                    raise BudgetExhausted(resource)
+                await self.limiter.acquire(url)
+            self.github_requests += 1
+            resp = await client.get(url, **kw)
+            # Revalidations (304) aren't charged; the headers say so
+            await self.budget.record(resource, resp)
+            return resp
+
+        try:
+            return await conditional_get(
+                client, self.cache, url, get=fetch,
+                ttl=RECON_CACHE_TTLS[source], negative_ttl=RECON_NEGATIVE_TTL, **kwargs
+            )
+        except BudgetExhausted:
+            stale = await self.cache.stale(self.cache.key(url, kwargs.get("params")))
+            if stale is None:
+                raise
+            return stale
+
+    async def _enrich_company(self, client: httpx.AsyncClient, c: dict) -> int:
+        """Look a company up in every source and store what's new. Returns contacts added."""
+        domain = self._extract_domain(c.get("website") or "")
+        logs = []
+
+        # Network first, without holding the writer; the two sources are independent
+        async def yc_source():
+            publish("progress", agent=self.name, source="yc_profile", company=c["name"])
+            try:
+                return await self._scrape_yc_profile(client, c)
+            except Exception as e:
+                logs.append(("yc_profile_error", f"YC profile failed for {c['name']}: {str(e)[:200]}", "error"))
+                return []
+
+        async def github_source():
+            publish("progress", agent=self.name, source="github", company=c["name"])
+            try:
+                gh_contacts, _ = await self._search_github(client, c, domain)
+                return gh_contacts
+            except Exception as e:
+                logs.append(("github_error", f"GitHub search failed for {c['name']}: {str(e)[:200]}", "error"))
+                return []
+
+        yc_contacts, gh_contacts = await asyncio.gather(yc_source(), github_source())
+
+        # Dedup against the keys loaded up front; nothing is read back per contact
+        keys = self.contact_keys.setdefault(c["id"], (set(), set()))
+        new_contacts = []
+        founders_found = []  # Track names found for email pattern generation
+
+        # --- Source 1: YC Profile Scraping ---
+        for contact in yc_contacts:
+            if self._take_if_new(keys, c["id"], contact, new_contacts):
+                founders_found.append(contact)
+        if yc_contacts:
+            logs.append(("yc_profile", f"Found {len(yc_contacts)} contacts from YC profile for {c['name']}", "success"))
+
+        # --- Source 2: GitHub Search ---
+        for contact in gh_contacts:
+            if self._take_if_new(keys, c["id"], contact, new_contacts):
+                founders_found.append(contact)
+        if gh_contacts:
+            logs.append(("github", f"Found {len(gh_contacts)} contacts from GitHub for {c['name']}", "success"))
+
+        # --- Source 3: Email Pattern Generator ---
+        if domain and founders_found:
+            try:
+                email_contacts = self._generate_email_patterns(founders_found, domain, c["name"])
+                for contact in email_contacts:
+                    self._take_if_new(keys, c["id"], contact, new_contacts)
+                if email_contacts:
+                    logs.append(("email_pattern", f"Generated {len(email_contacts)} email patterns for {c['name']}", "success"))
+            except Exception as e:
+                logs.append(("email_pattern_error", f"Email pattern failed for {c['name']}: {str(e)[:200]}", "error"))
+        # No generic fallback — only generate patterns for known founders
+
+        # --- Source 4: LinkedIn URL Generator ---
+        try:
+            linkedin_contacts = self._generate_linkedin_urls(founders_found, c["name"], c.get("slug", ""))
+            for contact in linkedin_contacts:
+                self._take_if_new(keys, c["id"], contact, new_contacts)
+            if linkedin_contacts:
+                logs.append(("linkedin", f"Generated {len(linkedin_contacts)} LinkedIn URLs for {c['name']}", "success"))
+        except Exception as e:
+            logs.append(("linkedin_error", f"LinkedIn URL gen failed for {c['name']}: {str(e)[:200]}", "error"))
+
+        for action, details, status in logs:
+            await log_action(self.name, action, details, c["id"], status)
+        if not new_contacts:
+            return 0
+        async with db_write() as db:
+            # The unique indexes catch anything added since the keys were loaded
+            cursor = await db.executemany(
+                "INSERT OR IGNORE INTO contacts (company_id, name, role, email, linkedin_url, source) VALUES (?, ?, ?, ?, ?, ?)",
+                new_contacts
+            )
+            return cursor.rowcount
 
     def _extract_domain(self, website: str) -> str:
         """Extract domain from a website URL."""
@@ -202,7 +360,7 @@ class ReconAgent:
         except Exception:
             return ""
 
-    async def _scrape_yc_profile(self, client: httpx.AsyncClient, company: dict, db) -> list:
+    async def _scrape_yc_profile(self, client: httpx.AsyncClient, company: dict) -> list:
         """Source 1: Scrape YC profile page and yc-oss API for founder info."""
         contacts = []
         slug = company.get("slug", "")
@@ -215,105 +373,19 @@ class ReconAgent:
         if batch:
             try:
                 oss_url = f"https://yc-oss.github.io/api/batches/{batch}/{slug}.json"
-                resp = await client.get(oss_url)
+                resp = await self._get(client, "yc_oss", oss_url)
                 if resp.status_code == 200:
-                    data = resp.json()
-                    # Look for founders field
-                    founders = data.get("founders", [])
-                    if isinstance(founders, list):
-                        for f in founders:
-                            if isinstance(f, dict):
-                                name = f.get("full_name") or f.get("name") or ""
-                                if name:
-                                    contacts.append({
-                                        "name": name,
-                                        "role": f.get("title") or f.get("role") or "Founder",
-                                        "email": f.get("email") or "",
-                                        "linkedin_url": f.get("linkedin_url") or f.get("linkedin") or "",
-                                        "source": "yc_profile",
-                                    })
-                            elif isinstance(f, str) and len(f) > 2:
-                                contacts.append({
-                                    "name": f,
-                                    "role": "Founder",
-                                    "email": "",
-                                    "linkedin_url": "",
-                                    "source": "yc_profile",
-                                })
-                    # Also check top-level fields
-                    for key in ["founder_names", "team"]:
-                        val = data.get(key)
-                        if isinstance(val, list):
-                            for item in val:
-                                if isinstance(item, str) and len(item) > 2:
-                                    if not any(c["name"] == item for c in contacts):
-                                        contacts.append({"name": item, "role": "Founder", "email": "", "linkedin_url": "", "source": "yc_profile"})
-                                elif isinstance(item, dict):
-                                    name = item.get("full_name") or item.get("name") or ""
-                                    if name and not any(c["name"] == name for c in contacts):
-                                        contacts.append({
-                                            "name": name,
-                                            "role": item.get("title") or item.get("role") or "Team Member",
-                                            "email": item.get("email") or "",
-                                            "linkedin_url": item.get("linkedin_url") or item.get("linkedin") or "",
-                                            "source": "yc_profile",
-                                        })
+                    contacts = parse_oss(resp.content)
             except Exception:
                 pass
 
-            await asyncio.sleep(1.0)
-
         # Also try scraping the YC HTML page
         if not contacts:
             try:
                 yc_url = f"https://www.ycombinator.com/companies/{slug}"
-                resp = await client.get(yc_url, headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"})
+                resp = await self._get(client, "yc_page", yc_url, headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"})
                 if resp.status_code == 200:
-                    html = resp.text[:100000]
-                    # Look for founder names in structured data or common patterns
-                    # YC pages often have JSON-LD or Next.js data
-                    json_match = re.search(r'<script id="__NEXT_DATA__" type="application/json">(.*?)</script>', html, re.DOTALL)
-                    if json_match:
-                        try:
-                            next_data = json.loads(json_match.group(1))
-                            # Navigate the Next.js data structure to find founders
-                            props = next_data.get("props", {}).get("pageProps", {})
-                            company_data = props.get("company", props)
-                            founders = company_data.get("founders", [])
-                            for f in founders:
-                                if isinstance(f, dict):
-                                    name = f.get("full_name") or f.get("name") or ""
-                                    if name and not any(c["name"] == name for c in contacts):
-                                        contacts.append({
-                                            "name": name,
-                                            "role": f.get("title") or "Founder",
-                                            "email": "",
-                                            "linkedin_url": f.get("linkedin_url") or "",
-                                            "source": "yc_profile",
-                                        })
-                        except (json.JSONDecodeError, KeyError):
-                            pass
-
-                    # Fallback: regex patterns for founder names on the page
-                    if not contacts:
-                        founder_patterns = [
-                            r'(?:Founder|Co-[Ff]ounder|CEO|CTO)[:\s,\-–]+([A-Z][a-z]+ [A-Z][a-z]+)',
-                            r'([A-Z][a-z]+ [A-Z][a-z]+)[,\s\-–]+(?:Founder|Co-[Ff]ounder|CEO|CTO)',
-                        ]
-                        seen = set()
-                        for pat in founder_patterns:
-                            for m in re.finditer(pat, html):
-                                name = m.group(1).strip()
-                                if name not in seen and len(name) > 3 and len(name) < 40:
-                                    seen.add(name)
-                                    role_m = re.search(r'(CEO|CTO|Founder|Co-[Ff]ounder)', m.group(0))
-                                    contacts.append({
-                                        "name": name,
-                                        "role": role_m.group(1) if role_m else "Founder",
-                                        "email": "",
-                                        "linkedin_url": "",
-                                        "source": "yc_profile",
-                                    })
+                    contacts = await parse_page(resp.content)
             except Exception:
                 pass
 
@@ -334,10 +406,11 @@ class ReconAgent:
             search_queries.append(domain)
 
         seen_usernames = set()
+        priority = company.get("relevance_score") or 0
         for query in search_queries:
             try:
-                resp = await client.get(
-                    "https://api.github.com/search/users",
+                resp = await self._get(
+                    client, "github_search", "https://api.github.com/search/users", priority=priority,
                     params={"q": f"{query} type:user", "per_page": 5},
                     headers={"Accept": "application/vnd.github.v3+json"},
                 )
@@ -358,12 +431,10 @@ class ReconAgent:
                         continue
                     seen_usernames.add(username)
 
-                    await asyncio.sleep(1.5)
-
                     # Fetch user profile for more details
                     try:
-                        profile_resp = await client.get(
-                            f"https://api.github.com/users/{username}",
+                        profile_resp = await self._get(
+                            client, "github_user", f"https://api.github.com/users/{username}", priority=priority,
                             headers={"Accept": "application/vnd.github.v3+json"},
                         )
                         request_count += 1
@@ -391,10 +462,12 @@ class ReconAgent:
                                 "linkedin_url": "",
                                 "source": "github",
                             })
+                    except BudgetExhausted:
+                        raise
                     except Exception:
                         continue
-
-                await asyncio.sleep(1.5)
+            except BudgetExhausted:
+                break
             except Exception:
                 continue
 
@@ -470,36 +543,41 @@ class ReconAgent:
 
         return contacts
 
-    async def _insert_contact_if_new(self, db, company_id: int, contact: dict) -> bool:
-        """Insert contact if not duplicate. Check by company_id + (email or name+source)."""
+    async def _load_contact_keys(self, company_ids: list) -> dict:
+        """{company_id: (emails, {(name, source)})} for the existing contacts of these companies, in one query."""
+        keys = {cid: (set(), set()) for cid in company_ids}
+        if not company_ids:
+            return keys
+        async with db_read() as db:
+            cursor = await db.execute(
+                f"SELECT company_id, name, email, source FROM contacts WHERE company_id IN ({','.join('?' * len(company_ids))})",
+                company_ids
+            )
+            for r in await cursor.fetchall():
+                emails, names = keys[r["company_id"]]
+                if r["email"]:
+                    emails.add(r["email"])
+                names.add((r["name"], r["source"]))
+        return keys
+
+    def _take_if_new(self, keys: tuple, company_id: int, contact: dict, rows: list) -> bool:
+        """Queue contact for insert unless a duplicate by company_id + (email or name+source)."""
         email = contact.get("email", "").strip()
         name = contact.get("name", "").strip()
         source = contact.get("source", "")
+        emails, names = keys
 
         if not name:
             return False
-
-        # Check for duplicate by email (if email exists)
-        if email:
-            cursor = await db.execute(
-                "SELECT id FROM contacts WHERE company_id = ? AND email = ?",
-                (company_id, email)
-            )
-            if await cursor.fetchone():
-                return False
-
-        # Check for duplicate by name + source
-        cursor = await db.execute(
-            "SELECT id FROM contacts WHERE company_id = ? AND name = ? AND source = ?",
-            (company_id, name, source)
-        )
-        if await cursor.fetchone():
+        if email and email in emails:
+            return False
+        if (name, source) in names:
             return False
 
-        await db.execute(
-            "INSERT INTO contacts (company_id, name, role, email, linkedin_url, source) VALUES (?, ?, ?, ?, ?, ?)",
-            (company_id, name, contact.get("role", ""), email, contact.get("linkedin_url", ""), source)
-        )
+        if email:
+            emails.add(email)
+        names.add((name, source))
+        rows.append((company_id, name, contact.get("role", ""), email, contact.get("linkedin_url", ""), source))
         return True
 
 
@@ -507,39 +585,103 @@ class WriterAgent:
     name = "writer"
 
     async def run(self) -> dict:
-        db = await get_db()
-        await log_action(db, self.name, "skip", "Writer agent coming soon — email generation not yet implemented", status="info")
-        await db.close()
-        return {"drafted": 0, "message": "Writer agent coming soon"}
+        """Draft outreach for the top WRITER_TARGETS companies that have none yet.
+
+        Drafts the writer made earlier (status still 'drafted', not edited
+        by hand) are redone when the company's draft_key changed, and
+        otherwise skipped. Everything is written in one transaction.
+        """
+        await log_action(self.name, "start", "Starting writer agent — drafting outreach for top companies")
+        started = time.perf_counter()
+        async with db_read() as db:
+            cursor = await db.execute("""
+                SELECT c.id, c.name, c.one_liner, c.long_description, c.batch, c.team_size,
+                       o.id AS outreach_id, o.draft_hash,
+                       (SELECT id FROM contacts WHERE company_id = c.id AND email != '' ORDER BY id LIMIT 1) AS contact_id
+                FROM companies c
+                LEFT JOIN outreach o ON o.id = (
+                    SELECT id FROM outreach WHERE company_id = c.id ORDER BY updated_at DESC, id DESC LIMIT 1
+                )
+                WHERE c.relevance_score > 0
+                  AND (c.outreach_status IS NULL OR (o.status = 'drafted' AND o.draft_hash IS NOT NULL))
+                ORDER BY c.relevance_score DESC
+                LIMIT ?
+            """, (WRITER_TARGETS,))
+            companies = [dict(r) for r in await cursor.fetchall()]
+
+        inserts, refreshes, rendered, unchanged = [], [], [], 0
+        for i in range(0, len(companies), WRITER_CHUNK):
+            for c in companies[i:i + WRITER_CHUNK]:
+                key = draft_key(c)
+                if c["draft_hash"] == key:
+                    unchanged += 1
+                    continue
+                emails = generate_emails(c)
+                rendered.append((key, c["id"], emails))
+                draft = format_draft(emails[0])
+                if c["outreach_id"] is None:
+                    inserts.append((c["id"], c["contact_id"], draft, key, c["id"]))
+                else:
+                    refreshes.append((draft, key, c["outreach_id"]))
+            await report_progress(agent=self.name, companies_done=min(i + WRITER_CHUNK, len(companies)),
+                                  companies_total=len(companies))
+
+        drafted = refreshed = 0
+        if inserts or refreshes:
+            async with db_write() as db:
+                # Rows the user added or edited since the read above are left alone
+                cursor = await db.executemany("""
+                    INSERT INTO outreach (company_id, contact_id, status, email_draft, draft_hash)
+                    SELECT ?, ?, 'drafted', ?, ?
+                    WHERE NOT EXISTS (SELECT 1 FROM outreach WHERE company_id = ?)
+                """, inserts)
+                drafted = cursor.rowcount
+                cursor = await db.executemany("""
+                    UPDATE outreach SET email_draft = ?, draft_hash = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND status = 'drafted' AND draft_hash IS NOT NULL
+                """, refreshes)
+                refreshed = cursor.rowcount
+                # The company page's drafts come from the same render
+                await store_drafts(db, rendered)
+
+        elapsed = time.perf_counter() - started
+        rate = round((drafted + refreshed) / elapsed) if elapsed else drafted + refreshed
+        await log_action(
+            self.name, "complete",
+            f"Drafted outreach for {drafted} companies, redid {refreshed} changed drafts, "
+            f"{unchanged} unchanged (of {len(companies)} top-scored) in {elapsed:.2f}s, {rate} drafts/s",
+            status="success",
+        )
+        await flush_logs()
+        return {"drafted": drafted, "refreshed": refreshed, "unchanged": unchanged,
+                "companies_checked": len(companies), "seconds": round(elapsed, 3), "per_second": rate}
 
 
 class TrackerAgent:
     name = "tracker"
 
     async def run(self) -> dict:
-        db = await get_db()
-        await log_action(db, self.name, "start", "Starting tracker agent — checking follow-ups")
-
-        # Mark outreach needing follow-up (sent > 3 days ago, not yet flagged)
-        cursor = await db.execute("""
-            UPDATE outreach SET needs_followup = 1
-            WHERE status = 'sent' AND sent_at IS NOT NULL
-            AND datetime(sent_at) < datetime('now', '-3 days')
-            AND needs_followup = 0
-        """)
-        await db.commit()
-        flagged = cursor.rowcount
-
-        # Summary stats
-        cursor = await db.execute("SELECT COUNT(*) FROM outreach WHERE needs_followup = 1")
-        total_followup = (await cursor.fetchone())[0]
-
-        cursor = await db.execute("SELECT status, COUNT(*) as cnt FROM outreach GROUP BY status")
-        by_status = {r["status"]: r["cnt"] for r in await cursor.fetchall()}
+        await log_action(self.name, "start", "Starting tracker agent — checking follow-ups")
+        async with db_write() as db:
+            # Mark outreach needing follow-up (sent > 3 days ago, not yet flagged)
+            cursor = await db.execute("""
+                UPDATE outreach SET needs_followup = 1
+                WHERE status = 'sent' AND sent_at IS NOT NULL
+                AND datetime(sent_at) < datetime('now', '-3 days')
+                AND needs_followup = 0
+            """)
+            flagged = cursor.rowcount
+
+            # Summary stats
+            cursor = await db.execute("SELECT COUNT(*) FROM outreach WHERE needs_followup = 1")
+            total_followup = (await cursor.fetchone())[0]
+
+            cursor = await db.execute("SELECT status, COUNT(*) as cnt FROM outreach GROUP BY status")
+            by_status = {r["status"]: r["cnt"] for r in await cursor.fetchall()}
 
         summary = f"Flagged {flagged} new follow-ups. Total needing follow-up: {total_followup}. Pipeline: {json.dumps(by_status)}"
-        await log_action(db, self.name, "complete", summary, status="success")
-        await db.close()
+        await log_action(self.name, "complete", summary, status="success")
+        await flush_logs()
         return {"newly_flagged": flagged, "total_followup": total_followup, "by_status": by_status}
 
 
@@ -547,25 +689,58 @@ class OrchestratorAgent:
     name = "orchestrator"
 
     async def run(self) -> dict:
-        db = await get_db()
-        await log_action(db, self.name, "pipeline_start", "Starting full agent pipeline")
-        await db.close()
-
-        results = {}
-        agents = [
-            ("scout", ScoutAgent()),
-            ("recon", ReconAgent()),
-            ("writer", WriterAgent()),
-            ("tracker", TrackerAgent()),
-        ]
-
-        for name, agent in agents:
+        """Run the PIPELINE graph: each stage starts as soon as the stages it waits for are done."""
+        await log_action(self.name, "pipeline_start", "Starting full agent pipeline")
+
+        stream = asyncio.Queue(RECON_STREAM_QUEUE)
+
+        # Each stage holds its agent's run lock; if that agent is already
+        # running on its own, the stage waits for that run instead
+        async def scout():
             try:
-                results[name] = await agent.run()
+                return await run_exclusive("scout", lambda: ScoutAgent().run(stream))
+            finally:
+                end_stream(stream)
+
+        agents = {
+            "scout": scout,
+            "recon": lambda: run_exclusive("recon", lambda: ReconAgent().run(stream)),
+            "writer": lambda: run_exclusive("writer", WriterAgent().run),
+            "tracker": lambda: run_exclusive("tracker", TrackerAgent().run),
+        }
+        results, timings = {}, {}
+        started = time.monotonic()
+
+        async def run_stage(name):
+            for dep in PIPELINE[name]:
+                await tasks[dep]
+            stage_start = time.monotonic()
+            await report_progress(agent=self.name, stage=name, stages_done=len(timings), stages_total=len(PIPELINE))
+            try:
+                results[name] = await agents[name]()
             except Exception as e:
                 results[name] = {"error": str(e)}
+            timings[name] = {"started_s": round(stage_start - started, 2),
+                             "seconds": round(time.monotonic() - stage_start, 2)}
+            await report_progress(agent=self.name, stages_done=len(timings), stages_total=len(PIPELINE))
 
-        db = await get_db()
-        await log_action(db, self.name, "pipeline_complete", f"Pipeline finished: {json.dumps(results)}", status="success")
-        await db.close()
+        tasks = {name: asyncio.create_task(run_stage(name)) for name in PIPELINE}
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        results = {name: results[name] for name in PIPELINE}
+        results["timings"] = {**{name: timings[name] for name in PIPELINE},
+                              "total_s": round(time.monotonic() - started, 2)}
+        await log_action(
+            self.name, "timings",
+            ", ".join(f"{name} {t['seconds']}s from {t['started_s']}s" for name, t in timings.items())
+            + f"; pipeline {results['timings']['total_s']}s",
+        )
+        await log_action(self.name, "pipeline_complete", f"Pipeline finished: {json.dumps(results)}", status="success")
+        await flush_logs()
+        # Retention rides on the pipeline, which is what grows the log
+        await compact_agent_logs()
         return results
@@ -1,96 +1,742 @@
 import aiosqlite
+import asyncio
+import json
 import os
+import re
+import time
+from contextlib import asynccontextmanager
+from email_generator import DRAFT_FIELDS
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "data", "yc_outreach.db")
 
-async def get_db():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    db = await aiosqlite.connect(DB_PATH)
-    db.row_factory = aiosqlite.Row
-    await db.execute("PRAGMA journal_mode=WAL")
-    await db.execute("PRAGMA foreign_keys=ON")
-    return db
+# Pool sizing and per-connection tuning. Pragmas are applied once when a
+# connection is opened, not on every checkout.
+DB_POOL_READERS = int(os.environ.get("DB_POOL_READERS", "4"))
+DB_STATEMENT_CACHE = int(os.environ.get("DB_STATEMENT_CACHE", "256"))
+DB_BUSY_TIMEOUT = 10.0
+DB_PRAGMAS = {
+    "cache_size": int(os.environ.get("DB_CACHE_SIZE", "-16000")),  # negative = KiB
+    "mmap_size": int(os.environ.get("DB_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "synchronous": os.environ.get("DB_SYNCHRONOUS", "NORMAL"),
+    "temp_store": os.environ.get("DB_TEMP_STORE", "MEMORY"),
+}
 
-async def init_db():
-    db = await get_db()
-    await db.executescript("""
-        CREATE TABLE IF NOT EXISTS companies (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            slug TEXT UNIQUE NOT NULL,
-            website TEXT,
-            one_liner TEXT,
-            long_description TEXT,
-            team_size INTEGER,
-            batch TEXT,
-            status TEXT,
-            industries TEXT DEFAULT '[]',
-            tags TEXT DEFAULT '[]',
-            locations TEXT DEFAULT '[]',
-            is_hiring INTEGER DEFAULT 0,
-            logo_url TEXT,
-            yc_url TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        CREATE TABLE IF NOT EXISTS contacts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            company_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            role TEXT,
-            email TEXT,
-            linkedin_url TEXT,
-            source TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (company_id) REFERENCES companies(id) ON DELETE CASCADE
-        );
-        CREATE TABLE IF NOT EXISTS outreach (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            company_id INTEGER NOT NULL,
-            contact_id INTEGER,
-            status TEXT DEFAULT 'new' CHECK(status IN ('new','drafted','sent','replied','interview')),
-            email_draft TEXT,
-            sent_at TIMESTAMP,
-            notes TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (company_id) REFERENCES companies(id) ON DELETE CASCADE,
-            FOREIGN KEY (contact_id) REFERENCES contacts(id) ON DELETE SET NULL
-        );
-        CREATE INDEX IF NOT EXISTS idx_companies_batch ON companies(batch);
-        CREATE INDEX IF NOT EXISTS idx_companies_slug ON companies(slug);
-        CREATE INDEX IF NOT EXISTS idx_outreach_status ON outreach(status);
-        CREATE INDEX IF NOT EXISTS idx_outreach_company ON outreach(company_id);
-
-        CREATE TABLE IF NOT EXISTS agent_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            agent_name TEXT NOT NULL,
-            action TEXT NOT NULL,
-            details TEXT,
-            company_id INTEGER,
-            status TEXT DEFAULT 'info' CHECK(status IN ('success','error','info')),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (company_id) REFERENCES companies(id) ON DELETE SET NULL
-        );
-        CREATE INDEX IF NOT EXISTS idx_agent_logs_agent ON agent_logs(agent_name);
-    """)
-
-    # Add columns if they don't exist (safe for existing DBs)
-    for stmt in [
-        "ALTER TABLE companies ADD COLUMN relevance_score INTEGER DEFAULT 0",
-        "ALTER TABLE outreach ADD COLUMN needs_followup INTEGER DEFAULT 0",
-    ]:
+
+class PoolStats:
+    """Checkout counters and wait times for one side of the pool."""
+
+    def __init__(self):
+        self.acquired = 0
+        self.waiting = 0
+        self.in_use = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, waited: float):
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def as_dict(self) -> dict:
+        return {
+            "acquired": self.acquired,
+            "waiting": self.waiting,
+            "in_use": self.in_use,
+            "avg_wait_ms": round(self.total_wait / self.acquired * 1000, 3) if self.acquired else 0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "total_wait_ms": round(self.total_wait * 1000, 3),
+        }
+
+
+class ConnectionPool:
+    """Long-lived SQLite connections: a bounded set of readers plus one writer.
+
+    SQLite only allows one writer at a time, so writes are serialized on a
+    single connection instead of contending for the file lock. Readers run
+    in parallel under WAL and are opened with query_only so a stray write
+    fails loudly instead of racing the writer.
+    """
+
+    def __init__(self, path: str = None, readers: int = None, pragmas: dict = None,
+                 statement_cache: int = None):
+        self.path = path or DB_PATH
+        self.size = readers or DB_POOL_READERS
+        self.pragmas = {**DB_PRAGMAS, **(pragmas or {})}
+        self.statement_cache = statement_cache or DB_STATEMENT_CACHE
+        self._readers: asyncio.Queue = None
+        self._all_readers = []
+        self._writer = None
+        self._write_lock = asyncio.Lock()
+        self._writer_owner = None
+        self._open_lock = asyncio.Lock()
+        self.reader_stats = PoolStats()
+        self.writer_stats = PoolStats()
+        self.loop = None
+        self.opened = False
+
+    async def _connect(self, read_only: bool = False):
+        db = await aiosqlite.connect(
+            self.path, timeout=DB_BUSY_TIMEOUT, cached_statements=self.statement_cache
+        )
+        db.row_factory = aiosqlite.Row
+        await db.execute("PRAGMA foreign_keys=ON")
+        for name, value in self.pragmas.items():
+            await db.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            await db.execute("PRAGMA query_only=ON")
+        return db
+
+    async def open(self):
+        async with self._open_lock:
+            if self.opened:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.loop = asyncio.get_running_loop()
+            self._readers = asyncio.Queue()
+            try:
+                self._writer = await self._connect()
+                # Drain the cursor: left open, it holds the write lock on a new file
+                async with self._writer.execute("PRAGMA journal_mode=WAL") as cursor:
+                    await cursor.fetchall()
+                for _ in range(self.size):
+                    conn = await self._connect(read_only=True)
+                    self._all_readers.append(conn)
+                    self._readers.put_nowait(conn)
+            except BaseException:
+                # Don't leave connection threads behind to keep the process alive
+                for conn in [self._writer, *self._all_readers]:
+                    if conn is not None:
+                        await conn.close()
+                self._writer, self._all_readers = None, []
+                raise
+            self.opened = True
+
+    async def close(self):
+        if not self.opened:
+            return
+        self.opened = False
+        async with self._write_lock:
+            await self._writer.close()
+        for conn in self._all_readers:
+            await conn.close()
+        self._all_readers = []
+
+    @asynccontextmanager
+    async def reader(self):
+        """Check out a read-only connection."""
+        stats = self.reader_stats
+        stats.waiting += 1
+        start = time.perf_counter()
+        try:
+            conn = await self._readers.get()
+        finally:
+            stats.waiting -= 1
+        stats.record(time.perf_counter() - start)
+        stats.in_use += 1
+        try:
+            yield conn
+        finally:
+            stats.in_use -= 1
+            if conn.in_transaction:
+                await conn.rollback()
+            self._readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def writer(self):
+        """Check out the writer; commits on clean exit, rolls back on error.
+
+        Re-entrant within a single task, so a helper that opens its own
+        writer can be called while the caller already holds it.
+        """
+        task = asyncio.current_task()
+        if self._writer_owner is task:
+            yield self._writer
+            return
+        stats = self.writer_stats
+        stats.waiting += 1
+        start = time.perf_counter()
+        try:
+            await self._write_lock.acquire()
+        finally:
+            stats.waiting -= 1
+        stats.record(time.perf_counter() - start)
+        stats.in_use += 1
+        self._writer_owner = task
         try:
-            await db.execute(stmt)
-            await db.commit()
-        except Exception:
-            pass  # Column already exists
-    await db.commit()
-    await db.close()
+            yield self._writer
+            if self._writer.in_transaction:
+                await self._writer.commit()
+        except BaseException:
+            if self._writer.in_transaction:
+                await self._writer.rollback()
+            raise
+        finally:
+            self._writer_owner = None
+            stats.in_use -= 1
+            self._write_lock.release()
+
+    def metrics(self) -> dict:
+        return {
+            "readers": self.size,
+            "idle_readers": self._readers.qsize() if self._readers else 0,
+            "pragmas": self.pragmas,
+            "statement_cache": self.statement_cache,
+            "reader": self.reader_stats.as_dict(),
+            "writer": self.writer_stats.as_dict(),
+        }
+
+
+_pool: ConnectionPool = None
+
+
+async def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, opening it on first use in this event loop."""
+    global _pool
+    if _pool is None or (_pool.loop is not None and _pool.loop is not asyncio.get_running_loop()):
+        _pool = ConnectionPool()
+    if not _pool.opened:
+        await _pool.open()
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+@asynccontextmanager
+async def db_read():
+    pool = await get_pool()
+    async with pool.reader() as db:
+        yield db
+
+
+@asynccontextmanager
+async def db_write():
+    pool = await get_pool()
+    async with pool.writer() as db:
+        yield db
+
+
+def pool_metrics() -> dict:
+    return _pool.metrics() if _pool is not None and _pool.opened else {"open": False}
+
+# Full-text index over the searchable company columns. External-content
+# table: the text lives in `companies`, triggers keep the index in step.
+SEARCH_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS companies_fts USING fts5(
+        name, one_liner, long_description,
+        content='companies', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    );
+    CREATE TRIGGER IF NOT EXISTS companies_fts_insert AFTER INSERT ON companies BEGIN
+        INSERT INTO companies_fts(rowid, name, one_liner, long_description)
+        VALUES (new.id, new.name, new.one_liner, new.long_description);
+    END;
+    CREATE TRIGGER IF NOT EXISTS companies_fts_delete AFTER DELETE ON companies BEGIN
+        INSERT INTO companies_fts(companies_fts, rowid, name, one_liner, long_description)
+        VALUES ('delete', old.id, old.name, old.one_liner, old.long_description);
+    END;
+    CREATE TRIGGER IF NOT EXISTS companies_fts_update AFTER UPDATE OF name, one_liner, long_description ON companies BEGIN
+        INSERT INTO companies_fts(companies_fts, rowid, name, one_liner, long_description)
+        VALUES ('delete', old.id, old.name, old.one_liner, old.long_description);
+        INSERT INTO companies_fts(rowid, name, one_liner, long_description)
+        VALUES (new.id, new.name, new.one_liner, new.long_description);
+    END;
+"""
+
+# Normalized copies of the JSON list columns on companies, one row per
+# (company, value), so filters are indexed lookups instead of LIKE scans.
+FACET_TABLES = {
+    "industries": ("company_industries", "industry"),
+    "tags": ("company_tags", "tag"),
+    "locations": ("company_locations", "location"),
+}
+
+FACET_SCHEMA = "".join(f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        company_id INTEGER NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+        {col} TEXT NOT NULL COLLATE NOCASE,
+        PRIMARY KEY (company_id, {col})
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_{table}_value ON {table}({col}, company_id);
+""" for table, col in FACET_TABLES.values())
+
+# Industry/tag values that mark a company as AI-focused
+AI_FACETS = ["AI", "Artificial Intelligence", "Machine Learning", "Generative AI", "Deep Learning",
+             "NLP", "Computer Vision", "Conversational AI", "AI Assistant"]
+
+def location_list(value) -> list:
+    """A company's locations as a list. yc-oss sends all_locations as one "; "-joined string."""
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(";") if v.strip()]
+    return value if isinstance(value, list) else []
+
+async def normalize_locations(db) -> int:
+    """Rewrite locations stored as a JSON string into a list, and rebuild their facets. Returns rows fixed."""
+    cursor = await db.execute(
+        "SELECT id, locations FROM companies WHERE json_valid(locations) AND json_type(locations) = 'text'"
+    )
+    rows = [(json.dumps(location_list(json.loads(r["locations"]))), r["id"]) for r in await cursor.fetchall()]
+    if rows:
+        await db.executemany("UPDATE companies SET locations = ? WHERE id = ?", rows)
+        await sync_company_facets(db, [company_id for _, company_id in rows])
+    return len(rows)
+
+async def sync_company_facets(db, company_ids=None):
+    """Rebuild the facet rows for the given companies (all when None) from their JSON columns."""
+    scope, params = "", []
+    if company_ids is not None:
+        company_ids = list(company_ids)
+        if not company_ids:
+            return
+        scope = f"AND c.id IN ({','.join('?' * len(company_ids))})"
+        params = company_ids
+    for column, (table, col) in FACET_TABLES.items():
+        if company_ids is None:
+            await db.execute(f"DELETE FROM {table}")
+        else:
+            await db.execute(f"DELETE FROM {table} WHERE company_id IN ({','.join('?' * len(company_ids))})", params)
+        await db.execute(f"""
+            INSERT OR IGNORE INTO {table} (company_id, {col})
+            SELECT c.id, TRIM(j.value) FROM companies c, json_each(c.{column}) j
+            WHERE json_valid(c.{column}) AND j.type = 'text' AND TRIM(j.value) != '' {scope}
+        """, params)
+
+def facet_filter(column: str, values: list, match: str = "any", prefix: bool = False):
+    """SQL condition on `c.id` for companies carrying any/all of the given facet values.
+
+    With prefix=True each value matches as a case-insensitive prefix
+    ("New York" matches "New York, NY, USA"); this still uses the index
+    because the value column is NOCASE.
+    """
+    table, col = FACET_TABLES[column]
+    seen = {}
+    for v in values:
+        if v.strip():
+            seen.setdefault(v.strip().lower(), v.strip())
+    values = list(seen.values())
+    if prefix:
+        values = [re.sub(r"([%_\\])", r"\\\1", v) + "%" for v in values]
+        lookups = [f"SELECT company_id FROM {table} WHERE {col} LIKE ? ESCAPE '\\'" for _ in values]
+        joiner = " INTERSECT " if match == "all" else " UNION "
+        return f"c.id IN ({joiner.join(lookups)})", values
+    placeholders = ",".join("?" * len(values))
+    if match == "all" and len(values) > 1:
+        sql = (f"c.id IN (SELECT company_id FROM {table} WHERE {col} IN ({placeholders}) "
+               f"GROUP BY company_id HAVING COUNT(*) = {len(values)})")
+    else:
+        sql = f"c.id IN (SELECT company_id FROM {table} WHERE {col} IN ({placeholders}))"
+    return sql, values
+
+# bm25 column weights: a hit in the name outranks one in the description
+SEARCH_WEIGHTS = (10.0, 5.0, 1.0)
+
+def fts_query(text: str):
+    """Turn free-text user input into an FTS5 prefix query, or None if it has no terms.
+
+    Every term must match (implicit AND) and is matched as a prefix, so
+    results narrow as the user types.
+    """
+    terms = re.findall(r"\w+", text or "")
+    if not terms:
+        return None
+    return " ".join(f'"{t}"*' for t in terms)
+
+async def optimize_search_index(db):
+    """Merge the FTS b-trees after a bulk load so queries touch fewer segments."""
+    await db.execute("INSERT INTO companies_fts(companies_fts) VALUES ('optimize')")
+
+# Per-company rollups stored on companies so listings don't run correlated
+# subqueries per row: contact_count and the status of the most recently
+# updated outreach row. Triggers keep them exact on every write.
+LATEST_OUTREACH_STATUS = """
+    (SELECT o.status FROM outreach o WHERE o.company_id = {company}
+     ORDER BY o.updated_at DESC, o.id DESC LIMIT 1)
+"""
+
+DENORM_SCHEMA = f"""
+    CREATE INDEX IF NOT EXISTS idx_outreach_company_updated ON outreach(company_id, updated_at, id);
+    CREATE INDEX IF NOT EXISTS idx_companies_outreach_status ON companies(outreach_status, is_hiring DESC, name, id);
+
+    CREATE TRIGGER IF NOT EXISTS contacts_count_insert AFTER INSERT ON contacts BEGIN
+        UPDATE companies SET contact_count = contact_count + 1 WHERE id = new.company_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS contacts_count_delete AFTER DELETE ON contacts BEGIN
+        UPDATE companies SET contact_count = contact_count - 1 WHERE id = old.company_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS contacts_count_move AFTER UPDATE OF company_id ON contacts
+    WHEN old.company_id IS NOT new.company_id BEGIN
+        UPDATE companies SET contact_count = contact_count - 1 WHERE id = old.company_id;
+        UPDATE companies SET contact_count = contact_count + 1 WHERE id = new.company_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS outreach_status_insert AFTER INSERT ON outreach BEGIN
+        UPDATE companies SET outreach_status = {LATEST_OUTREACH_STATUS.format(company="new.company_id")}
+        WHERE id = new.company_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS outreach_status_update AFTER UPDATE OF status, updated_at, company_id ON outreach BEGIN
+        UPDATE companies SET outreach_status = {LATEST_OUTREACH_STATUS.format(company="new.company_id")}
+        WHERE id = new.company_id;
+        UPDATE companies SET outreach_status = {LATEST_OUTREACH_STATUS.format(company="old.company_id")}
+        WHERE id = old.company_id AND old.company_id IS NOT new.company_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS outreach_status_delete AFTER DELETE ON outreach BEGIN
+        UPDATE companies SET outreach_status = {LATEST_OUTREACH_STATUS.format(company="old.company_id")}
+        WHERE id = old.company_id;
+    END;
+"""
+
+async def refresh_company_rollups(db, company_ids=None):
+    """Recompute contact_count and outreach_status from scratch (all companies when None)."""
+    scope, params = "", []
+    if company_ids is not None:
+        company_ids = list(company_ids)
+        if not company_ids:
+            return
+        scope = f"WHERE id IN ({','.join('?' * len(company_ids))})"
+        params = company_ids
+    await db.execute(f"""
+        UPDATE companies SET
+            contact_count = (SELECT COUNT(*) FROM contacts ct WHERE ct.company_id = companies.id),
+            outreach_status = {LATEST_OUTREACH_STATUS.format(company="companies.id")}
+        {scope}
+    """, params)
+
+# Dashboard counters, maintained by triggers so /api/stats never has to
+# aggregate the base tables. Keyed by (metric, bucket); scalar metrics use
+# bucket ''. "version" bumps on every counted change so readers can cache.
+def _bump(metric: str, bucket: str, delta: str) -> str:
+    return f"""
+        INSERT INTO stat_counters (metric, bucket, value) VALUES ('{metric}', {bucket}, {delta})
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + excluded.value;"""
+
+_VERSION = _bump("version", "''", "1")
+
+STATS_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS stat_counters (
+        metric TEXT NOT NULL,
+        bucket TEXT NOT NULL DEFAULT '',
+        value INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (metric, bucket)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_outreach_updated ON outreach(updated_at);
+    CREATE INDEX IF NOT EXISTS idx_outreach_followup ON outreach(status, datetime(sent_at));
+
+    CREATE TRIGGER IF NOT EXISTS stats_companies_insert AFTER INSERT ON companies BEGIN
+        {_bump("companies", "''", "1")}
+        {_bump("companies_hiring", "''", "new.is_hiring = 1")}
+        {_bump("companies_scored", "''", "new.relevance_score > 0")}
+        {_bump("companies_by_batch", "COALESCE(new.batch, '')", "1")}
+        {_VERSION}
+    END;
+    CREATE TRIGGER IF NOT EXISTS stats_companies_delete AFTER DELETE ON companies BEGIN
+        {_bump("companies", "''", "-1")}
+        {_bump("companies_hiring", "''", "-(old.is_hiring = 1)")}
+        {_bump("companies_scored", "''", "-(old.relevance_score > 0)")}
+        {_bump("companies_by_batch", "COALESCE(old.batch, '')", "-1")}
+        {_VERSION}
+    END;
+    CREATE TRIGGER IF NOT EXISTS stats_companies_update AFTER UPDATE OF is_hiring, relevance_score, batch ON companies
+    WHEN old.is_hiring IS NOT new.is_hiring OR old.relevance_score IS NOT new.relevance_score
+         OR old.batch IS NOT new.batch BEGIN
+        {_bump("companies_hiring", "''", "(new.is_hiring = 1) - (old.is_hiring = 1)")}
+        {_bump("companies_scored", "''", "(new.relevance_score > 0) - (old.relevance_score > 0)")}
+        {_bump("companies_by_batch", "COALESCE(old.batch, '')", "-1")}
+        {_bump("companies_by_batch", "COALESCE(new.batch, '')", "1")}
+        {_VERSION}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS stats_outreach_insert AFTER INSERT ON outreach BEGIN
+        {_bump("outreach_by_status", "new.status", "1")}
+        {_bump("outreach_followup", "''", "new.needs_followup = 1")}
+        {_VERSION}
+    END;
+    CREATE TRIGGER IF NOT EXISTS stats_outreach_delete AFTER DELETE ON outreach BEGIN
+        {_bump("outreach_by_status", "old.status", "-1")}
+        {_bump("outreach_followup", "''", "-(old.needs_followup = 1)")}
+        {_VERSION}
+    END;
+    CREATE TRIGGER IF NOT EXISTS stats_outreach_update AFTER UPDATE ON outreach BEGIN
+        {_bump("outreach_by_status", "old.status", "-1")}
+        {_bump("outreach_by_status", "new.status", "1")}
+        {_bump("outreach_followup", "''", "(new.needs_followup = 1) - (old.needs_followup = 1)")}
+        {_VERSION}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS stats_contacts_insert AFTER INSERT ON contacts BEGIN
+        {_bump("contacts", "''", "1")}
+        {_bump("contacts_by_source", "COALESCE(new.source, '')", "1")}
+        {_VERSION}
+    END;
+    CREATE TRIGGER IF NOT EXISTS stats_contacts_delete AFTER DELETE ON contacts BEGIN
+        {_bump("contacts", "''", "-1")}
+        {_bump("contacts_by_source", "COALESCE(old.source, '')", "-1")}
+        {_VERSION}
+    END;
+    CREATE TRIGGER IF NOT EXISTS stats_contacts_update AFTER UPDATE OF source ON contacts
+    WHEN old.source IS NOT new.source BEGIN
+        {_bump("contacts_by_source", "COALESCE(old.source, '')", "-1")}
+        {_bump("contacts_by_source", "COALESCE(new.source, '')", "1")}
+        {_VERSION}
+    END;
+
+    -- Not part of the dashboard snapshot, so no version bump per log line
+    CREATE TRIGGER IF NOT EXISTS stats_agent_logs_insert AFTER INSERT ON agent_logs BEGIN
+        {_bump("agent_logs", "''", "1")}
+    END;
+    CREATE TRIGGER IF NOT EXISTS stats_agent_logs_delete AFTER DELETE ON agent_logs BEGIN
+        {_bump("agent_logs", "''", "-1")}
+    END;
+"""
+
+# companies_ai depends on facets and the FTS index, so it is recomputed
+# after each scrape rather than tracked by triggers.
+AI_COUNT_SQL = f"""
+    SELECT COUNT(*) FROM (
+        SELECT company_id FROM company_industries WHERE industry IN ({",".join("?" * len(AI_FACETS))})
+        UNION SELECT company_id FROM company_tags WHERE tag IN ({",".join("?" * len(AI_FACETS))})
+        UNION SELECT rowid FROM companies_fts WHERE companies_fts MATCH 'one_liner : ("ai" OR "machine learning")'
+    )
+"""
+
+STAT_COUNTER_SOURCES = [
+    ("companies", "SELECT '', COUNT(*) FROM companies"),
+    ("companies_hiring", "SELECT '', COUNT(*) FROM companies WHERE is_hiring = 1"),
+    ("companies_scored", "SELECT '', COUNT(*) FROM companies WHERE relevance_score > 0"),
+    ("companies_by_batch", "SELECT COALESCE(batch, ''), COUNT(*) FROM companies GROUP BY 1"),
+    ("outreach_by_status", "SELECT status, COUNT(*) FROM outreach GROUP BY 1"),
+    ("outreach_followup", "SELECT '', COUNT(*) FROM outreach WHERE needs_followup = 1"),
+    ("contacts", "SELECT '', COUNT(*) FROM contacts"),
+    ("contacts_by_source", "SELECT COALESCE(source, ''), COUNT(*) FROM contacts GROUP BY 1"),
+    ("agent_logs", "SELECT '', COUNT(*) FROM agent_logs"),
+]
+
+async def compute_stat_counters(db) -> dict:
+    """Recount every counter from the base tables: {(metric, bucket): value}."""
+    counters = {}
+    for metric, sql in STAT_COUNTER_SOURCES:
+        cursor = await db.execute(sql)
+        for bucket, value in await cursor.fetchall():
+            if value:
+                counters[(metric, bucket)] = value
+    cursor = await db.execute(AI_COUNT_SQL, AI_FACETS + AI_FACETS)
+    counters[("companies_ai", "")] = (await cursor.fetchone())[0]
+    return counters
+
+async def rebuild_stat_counters(db):
+    """Replace the counters with a full recount, keeping (and bumping) the version."""
+    counters = await compute_stat_counters(db)
+    await db.execute("DELETE FROM stat_counters WHERE metric != 'version'")
+    await db.executemany(
+        "INSERT INTO stat_counters (metric, bucket, value) VALUES (?, ?, ?)",
+        [(metric, bucket, value) for (metric, bucket), value in counters.items()],
+    )
+    await db.execute(_VERSION)
+    return counters
+
+async def refresh_ai_count(db):
+    cursor = await db.execute(AI_COUNT_SQL, AI_FACETS + AI_FACETS)
+    count = (await cursor.fetchone())[0]
+    await db.execute(
+        "INSERT INTO stat_counters (metric, bucket, value) VALUES ('companies_ai', '', ?) "
+        "ON CONFLICT (metric, bucket) DO UPDATE SET value = excluded.value",
+        (count,),
+    )
+    await db.execute(_VERSION)
+
+# The same keys ReconAgent dedupes on; empty emails are not a key
+CONTACT_KEYS_SCHEMA = """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_contacts_company_email ON contacts(company_id, email) WHERE email != '';
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_contacts_company_name_source ON contacts(company_id, name, source);
+"""
+
+# Rendered generate_emails() output by company and draft_key (see draft_cache.py).
+# Per company, since companies with the same inputs share a key. A changed
+# company gets a new key anyway; the trigger drops what it leaves behind.
+DRAFT_CACHE_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS email_drafts (
+        company_id INTEGER NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+        key TEXT NOT NULL,
+        emails TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (company_id, key)
+    ) WITHOUT ROWID;
+    CREATE TRIGGER IF NOT EXISTS email_drafts_invalidate AFTER UPDATE OF {", ".join(DRAFT_FIELDS)} ON companies
+    WHEN {" OR ".join(f"old.{f} IS NOT new.{f}" for f in DRAFT_FIELDS)} BEGIN
+        DELETE FROM email_drafts WHERE company_id = old.id;
+    END;
+"""
+
+async def dedupe_contacts(db) -> int:
+    """Merge contacts that collide on a CONTACT_KEYS_SCHEMA key into the oldest one. Returns rows removed."""
+    cursor = await db.execute("SELECT id, company_id, name, email, source FROM contacts ORDER BY id")
+    kept, dupes = {}, []
+    for r in await cursor.fetchall():
+        keys = [("name", r["company_id"], r["name"], r["source"])] if r["source"] is not None else []
+        if r["email"]:
+            keys.append(("email", r["company_id"], r["email"]))
+        first = next((kept[k] for k in keys if k in kept), None)
+        if first is None:
+            for k in keys:
+                kept[k] = r["id"]
+        else:
+            for k in keys:
+                kept.setdefault(k, first)
+            dupes.append((first, r["id"]))
+    if dupes:
+        await db.executemany("UPDATE outreach SET contact_id = ? WHERE contact_id = ?", dupes)
+        await db.executemany("DELETE FROM contacts WHERE id = ?", [(d,) for _, d in dupes])
+    return len(dupes)
+
+async def init_db():
+    async with db_write() as db:
+        await db.executescript("""
+            CREATE TABLE IF NOT EXISTS companies (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                slug TEXT UNIQUE NOT NULL,
+                website TEXT,
+                one_liner TEXT,
+                long_description TEXT,
+                team_size INTEGER,
+                batch TEXT,
+                status TEXT,
+                industries TEXT DEFAULT '[]',
+                tags TEXT DEFAULT '[]',
+                locations TEXT DEFAULT '[]',
+                is_hiring INTEGER DEFAULT 0,
+                logo_url TEXT,
+                yc_url TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE IF NOT EXISTS contacts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                role TEXT,
+                email TEXT,
+                linkedin_url TEXT,
+                source TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (company_id) REFERENCES companies(id) ON DELETE CASCADE
+            );
+            CREATE TABLE IF NOT EXISTS outreach (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                contact_id INTEGER,
+                status TEXT DEFAULT 'new' CHECK(status IN ('new','drafted','sent','replied','interview')),
+                email_draft TEXT,
+                sent_at TIMESTAMP,
+                notes TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (company_id) REFERENCES companies(id) ON DELETE CASCADE,
+                FOREIGN KEY (contact_id) REFERENCES contacts(id) ON DELETE SET NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_companies_batch ON companies(batch);
+            CREATE INDEX IF NOT EXISTS idx_companies_slug ON companies(slug);
+            CREATE INDEX IF NOT EXISTS idx_outreach_status ON outreach(status);
+            CREATE INDEX IF NOT EXISTS idx_outreach_company ON outreach(company_id);
+
+            CREATE TABLE IF NOT EXISTS agent_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                agent_name TEXT NOT NULL,
+                action TEXT NOT NULL,
+                details TEXT,
+                company_id INTEGER,
+                status TEXT DEFAULT 'info' CHECK(status IN ('success','error','info')),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (company_id) REFERENCES companies(id) ON DELETE SET NULL
+            );
+            DROP INDEX IF EXISTS idx_agent_logs_agent;
+            CREATE INDEX IF NOT EXISTS idx_agent_logs_agent_created ON agent_logs(agent_name, created_at, id);
+            CREATE INDEX IF NOT EXISTS idx_agent_logs_created ON agent_logs(created_at, id);
+            CREATE INDEX IF NOT EXISTS idx_contacts_created ON contacts(created_at, id);
+            CREATE INDEX IF NOT EXISTS idx_contacts_company ON contacts(company_id);
+            CREATE INDEX IF NOT EXISTS idx_companies_listing ON companies(is_hiring DESC, name, id);
+
+            CREATE TABLE IF NOT EXISTS api_budgets (
+                name TEXT PRIMARY KEY,
+                budget_limit INTEGER NOT NULL,
+                remaining INTEGER NOT NULL,
+                reset_at INTEGER NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE IF NOT EXISTS scoring_profiles (
+                name TEXT PRIMARY KEY,
+                weights TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                target TEXT,
+                status TEXT NOT NULL CHECK(status IN ('queued','running','succeeded','failed','cancelled')),
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                created_at TIMESTAMP NOT NULL,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at);
+            -- Leases: at most one run per name, across processes (see jobs.py)
+            CREATE TABLE IF NOT EXISTS run_locks (
+                name TEXT PRIMARY KEY,
+                holder TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                acquired_at TIMESTAMP NOT NULL,
+                expires_at REAL NOT NULL
+            );
+        """)
+
+        # Add columns if they don't exist (safe for existing DBs)
+        for stmt in [
+            "ALTER TABLE companies ADD COLUMN relevance_score INTEGER DEFAULT 0",
+            "ALTER TABLE outreach ADD COLUMN needs_followup INTEGER DEFAULT 0",
+            "ALTER TABLE companies ADD COLUMN outreach_status TEXT",
+            "ALTER TABLE companies ADD COLUMN contact_count INTEGER DEFAULT 0",
+            "ALTER TABLE companies ADD COLUMN content_hash TEXT",
+            "ALTER TABLE companies ADD COLUMN features INTEGER",  # scoring.FEATURES bitmask
+            "ALTER TABLE outreach ADD COLUMN draft_hash TEXT",  # email_generator.draft_key of a WriterAgent draft
+        ]:
+            try:
+                await db.execute(stmt)
+            except Exception:
+                pass  # Column already exists
+        # Keyset order for ?sort_by=relevance; needs the column added above
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_companies_relevance ON companies(relevance_score DESC, is_hiring DESC, name, id)")
+
+        cursor = await db.execute(
+            "SELECT name FROM sqlite_master WHERE name IN "
+            "('companies_fts', 'company_industries', 'contacts_count_insert', 'stat_counters', 'idx_contacts_company_email', "
+            "'stats_agent_logs_insert')"
+        )
+        existing = {r["name"] for r in await cursor.fetchall()}
+        await db.executescript(SEARCH_SCHEMA + FACET_SCHEMA + DENORM_SCHEMA + STATS_SCHEMA + DRAFT_CACHE_SCHEMA)
+        # Backfill derived data for companies stored before it existed
+        if "companies_fts" not in existing:
+            await db.execute("INSERT INTO companies_fts(companies_fts) VALUES ('rebuild')")
+        if "company_industries" not in existing:
+            await sync_company_facets(db)
+        fixed = await normalize_locations(db)
+        if fixed:
+            print(f"[db] Split {fixed} string locations into lists")
+        if "contacts_count_insert" not in existing:
+            await refresh_company_rollups(db)
+        if "stat_counters" not in existing or "stats_agent_logs_insert" not in existing:
+            await rebuild_stat_counters(db)
+        if "idx_contacts_company_email" not in existing:
+            removed = await dedupe_contacts(db)
+            if removed:
+                print(f"[db] Merged {removed} duplicate contacts before adding unique keys")
+        await db.executescript(CONTACT_KEYS_SCHEMA)
 
 async def is_db_empty():
-    db = await get_db()
-    cursor = await db.execute("SELECT COUNT(*) FROM companies")
-    row = await cursor.fetchone()
-    count = row[0]
-    await db.close()
-    return count == 0
+    async with db_read() as db:
+        cursor = await db.execute("SELECT COUNT(*) FROM companies")
+        row = await cursor.fetchone()
+    return row[0] == 0
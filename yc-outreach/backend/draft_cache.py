@@ -0,0 +1,67 @@
+import json
+import os
+from collections import OrderedDict
+from database import db_read, db_write
+from email_generator import generate_emails, draft_key
+
+# Rendered drafts kept in memory; the least recently used go first
+DRAFT_CACHE_SIZE = int(os.environ.get("DRAFT_CACHE_SIZE", "512"))
+
+
+class DraftCache:
+    """generate_emails() output by company and draft_key, in an LRU over the email_drafts table.
+
+    The key is a digest of everything the templates read, so an entry can
+    never be stale: a company whose fields changed just has a different
+    key. Stored rows are per company as well, and the
+    email_drafts_invalidate trigger deletes the ones a change orphans;
+    orphaned memory entries age out of the LRU.
+    """
+
+    def __init__(self, size: int = DRAFT_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self.counters = {"memory_hits": 0, "db_hits": 0, "rendered": 0}
+
+    def _remember(self, entry: tuple, emails: list):
+        self._entries[entry] = emails
+        self._entries.move_to_end(entry)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    async def get(self, company: dict) -> list:
+        """Drafts for `company` (a row with at least id and the DRAFT_FIELDS)."""
+        key = draft_key(company)
+        entry = (company["id"], key)
+        emails = self._entries.get(entry)
+        if emails is not None:
+            self._entries.move_to_end(entry)
+            self.counters["memory_hits"] += 1
+            return emails
+        async with db_read() as db:
+            cursor = await db.execute("SELECT emails FROM email_drafts WHERE company_id = ? AND key = ?", entry)
+            row = await cursor.fetchone()
+        if row is not None:
+            emails = json.loads(row["emails"])
+            self.counters["db_hits"] += 1
+        else:
+            emails = generate_emails(company)
+            self.counters["rendered"] += 1
+            async with db_write() as db:
+                await store_drafts(db, [(key, company["id"], emails)])
+        self._remember(entry, emails)
+        return emails
+
+    def stats(self) -> dict:
+        return {**self.counters, "entries": len(self._entries), "size": self.size}
+
+
+draft_cache = DraftCache()
+
+
+async def store_drafts(db, rows: list):
+    """Save (key, company_id, emails) rows inside the caller's transaction."""
+    await db.executemany(
+        "INSERT OR REPLACE INTO email_drafts (key, company_id, emails) VALUES (?, ?, ?)",
+        [(key, company_id, json.dumps(emails)) for key, company_id, emails in rows],
+    )
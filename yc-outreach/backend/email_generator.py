@@ -1,3 +1,4 @@
+import hashlib
 import json
 import random
 import re
@@ -13,6 +14,20 @@ NAMIT_BIO = {
     "interests": ["building AI-powered products", "developer tools", "infrastructure", "applied ML"],
 }
 
+# Everything generate_emails() reads from a company
+DRAFT_FIELDS = ["name", "one_liner", "long_description", "batch", "team_size"]
+# Bump when the templates below change, so stored drafts are redone
+TEMPLATE_VERSION = 1
+
+# The part of every draft_key that only changes with the code
+_PROFILE_DIGEST = hashlib.sha1(json.dumps([TEMPLATE_VERSION, NAMIT_BIO], sort_keys=True).encode())
+
+def draft_key(company: dict) -> str:
+    """Digest of the inputs of generate_emails(company): same key, same drafts."""
+    digest = _PROFILE_DIGEST.copy()
+    digest.update(json.dumps([company.get(f) for f in DRAFT_FIELDS], ensure_ascii=False).encode())
+    return digest.hexdigest()
+
 def extract_keywords(text: str) -> list[str]:
     keywords = []
     ai_terms = ["ai", "machine learning", "ml", "deep learning", "nlp", "natural language", "computer vision",
@@ -122,3 +137,7 @@ LinkedIn: [link] | GitHub: [link]"""
         {"variant": "Value-Focused", "subject": v2_subject, "body": v2_body},
         {"variant": "Casual & Genuine", "subject": v3_subject, "body": v3_body},
     ]
+
+def format_draft(email: dict) -> str:
+    """One generate_emails() variant as outreach.email_draft text."""
+    return f"Subject: {email['subject']}\n\n{email['body']}"
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import time
+from collections import deque
+
+# Events kept for Last-Event-ID replay
+EVENT_BUFFER = 2000
+# Events a subscriber may have undelivered before it is switched to replay
+SUBSCRIBER_QUEUE = 256
+# Seconds between SSE keep-alive comments on an idle stream
+KEEPALIVE_INTERVAL = 15.0
+
+
+class Subscriber:
+    def __init__(self):
+        self.queue = asyncio.Queue(SUBSCRIBER_QUEUE)
+        self.lagged = False
+
+
+class EventBus:
+    """In-process pub/sub for agent progress.
+
+    publish() never waits: each subscriber has a bounded queue, and one
+    that fills up is marked lagged and gets nothing more; once it has
+    drained its queue it catches up from the replay buffer. Event ids are
+    "<boot>-<seq>", so an id from before a restart is recognised as
+    unknown rather than as old.
+    """
+
+    def __init__(self, buffer: int = EVENT_BUFFER):
+        self.boot = str(int(time.time()))
+        self._seq = 0
+        self._buffer = deque(maxlen=buffer)
+        self._subscribers = set()
+
+    def publish(self, event: str, data: dict):
+        self._seq += 1
+        item = (self._seq, event, data)
+        self._buffer.append(item)
+        for sub in self._subscribers:
+            if sub.lagged:
+                continue
+            try:
+                sub.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                sub.lagged = True
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.boot}-{seq}"
+
+    def since(self, seq: int):
+        """Buffered events after `seq`, or None when some of them were already dropped."""
+        if self._buffer and seq < self._buffer[0][0] - 1:
+            return None
+        return [item for item in self._buffer if item[0] > seq]
+
+    def parse_id(self, last_event_id: str):
+        """The sequence number in a Last-Event-ID from this process, else None."""
+        boot, _, seq = (last_event_id or "").partition("-")
+        if boot != self.boot or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def subscribe(self) -> Subscriber:
+        sub = Subscriber()
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        self._subscribers.discard(sub)
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self._subscribers), "last_id": self.event_id(self._seq),
+                "buffered": len(self._buffer)}
+
+
+bus = EventBus()
+
+
+def publish(event: str, **data):
+    bus.publish(event, data)
+
+
+def _sse(seq: int, event: str, data: dict) -> str:
+    return f"id: {bus.event_id(seq)}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def sse_stream(last_event_id: str = None):
+    """SSE text for one client: the replay after `last_event_id`, then live events.
+
+    When the replay can't be complete (unknown id, or the client fell out
+    of the buffer) a "reset" event tells it to reload instead.
+    """
+    sub = bus.subscribe()
+    try:
+        last = bus._seq
+        if last_event_id:
+            seq = bus.parse_id(last_event_id)
+            backlog = bus.since(seq) if seq is not None else None
+            if backlog is None:
+                yield _sse(last, "reset", {})
+            else:
+                for item in backlog:
+                    yield _sse(*item)
+                    last = item[0]
+        # Anything published while replaying is in sub.queue as well; skip those already sent
+        while True:
+            if sub.lagged and sub.queue.empty():
+                sub.lagged = False
+                backlog = bus.since(last)
+                if backlog is None:
+                    last = bus._seq
+                    yield _sse(last, "reset", {})
+                else:
+                    for item in backlog:
+                        yield _sse(*item)
+                        last = item[0]
+                continue
+            try:
+                item = await asyncio.wait_for(sub.queue.get(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item[0] > last:
+                yield _sse(*item)
+                last = item[0]
+    finally:
+        bus.unsubscribe(sub)
@@ -0,0 +1,286 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import httpx
+
+CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", os.path.join(os.path.dirname(__file__), "data", "http_cache"))
+HTTP_CACHE_MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Rewrite the on-disk index after this many changes even without flush()
+INDEX_FLUSH_EVERY = 50
+
+
+class CachedResponse:
+    """What conditional_get hands back: the body plus where it came from.
+
+    `changed` is False when the server answered 304 or sent a body whose
+    digest matches the one last marked as applied for this key.
+    """
+
+    def __init__(self, key: str, status_code: int, content: bytes, headers: dict,
+                 digest: str, from_cache: bool, changed: bool):
+        self.key = key
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.digest = digest
+        self.from_cache = from_cache
+        self.changed = changed
+
+    def json(self):
+        return json.loads(self.content)
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise httpx.HTTPStatusError(
+                f"HTTP {self.status_code} for {self.key}",
+                request=httpx.Request("GET", self.key),
+                response=httpx.Response(self.status_code),
+            )
+
+
+class HttpCache:
+    """On-disk response cache with an LRU size cap.
+
+    Bodies are files named by the key's digest; the index (validators,
+    digests, sizes, last access) is a JSON file next to them. Losing the
+    index only costs cache misses, so it is written in batches.
+    """
+
+    def __init__(self, name: str, max_bytes: int = HTTP_CACHE_MAX_BYTES, directory: str = None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.directory = directory or os.path.join(CACHE_DIR, name)
+        self._index_path = os.path.join(self.directory, "index.json")
+        self._entries = {}
+        self._dirty = 0
+        # hits: served without a request (TTL); revalidated: 304
+        self.counters = {"requests": 0, "hits": 0, "revalidated": 0, "misses": 0, "unchanged": 0,
+                         "stale": 0, "stored": 0, "evictions": 0}
+        self._load()
+
+    @staticmethod
+    def key(url: str, params: dict = None) -> str:
+        return str(httpx.URL(url, params=params)) if params else url
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+        # Drop body files the index doesn't know about (e.g. after a crash)
+        known = {os.path.basename(self._path(k)) for k in self._entries}
+        for fname in os.listdir(self.directory):
+            if fname != "index.json" and fname not in known:
+                try:
+                    os.remove(os.path.join(self.directory, fname))
+                except OSError:
+                    pass
+
+    def flush(self):
+        if not self._dirty:
+            return
+        tmp = self._index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp, self._index_path)
+        self._dirty = 0
+
+    def _touched(self):
+        self._dirty += 1
+        if self._dirty >= INDEX_FLUSH_EVERY:
+            self.flush()
+
+    def lookup(self, key: str):
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry["accessed_at"] = time.time()
+        return entry
+
+    async def read_body(self, key: str):
+        try:
+            return await asyncio.to_thread(_read_file, self._path(key))
+        except OSError:
+            # Body vanished underneath the index; forget the entry
+            self._entries.pop(key, None)
+            self._touched()
+            return None
+
+    async def store(self, key: str, status_code: int, content: bytes, headers: dict, digest: str,
+                    ttl: float = None):
+        old = self._entries.get(key, {})
+        if old.get("digest") != digest:
+            await asyncio.to_thread(_write_file, self._path(key), content)
+        now = time.time()
+        self._entries[key] = {
+            "status": status_code,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "content_type": headers.get("content-type"),
+            "digest": digest,
+            "applied": old.get("applied"),
+            "size": len(content),
+            "stored_at": now,
+            "accessed_at": now,
+            "expires_at": now + ttl if ttl else None,
+        }
+        self.counters["stored"] += 1
+        self._evict()
+        self._touched()
+
+    def refresh(self, key: str, ttl: float = None):
+        """Restart an entry's TTL after the server confirmed it (304)."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry["expires_at"] = time.time() + ttl if ttl else None
+            self._touched()
+
+    async def stale(self, key: str):
+        """The stored response for `key` whatever its age, or None."""
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+        body = await self.read_body(key)
+        if body is None:
+            return None
+        self.counters["stale"] += 1
+        return CachedResponse(key, entry["status"], body, {}, entry["digest"], True, False)
+
+    @staticmethod
+    def fresh(entry: dict) -> bool:
+        return bool(entry.get("expires_at")) and time.time() < entry["expires_at"]
+
+    def mark_applied(self, key: str, digest: str):
+        """Record that the consumer has processed this payload version."""
+        entry = self._entries.get(key)
+        if entry is not None and entry.get("applied") != digest:
+            entry["applied"] = digest
+            self._touched()
+
+    def _evict(self):
+        total = sum(e["size"] for e in self._entries.values())
+        if total <= self.max_bytes:
+            return
+        for key, entry in sorted(self._entries.items(), key=lambda kv: kv[1]["accessed_at"]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            total -= entry["size"]
+            del self._entries[key]
+            self.counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        c = self.counters
+        served = c["hits"] + c["revalidated"]
+        return {
+            **c,
+            "hit_rate": round(served / c["requests"], 3) if c["requests"] else 0,
+            "entries": len(self._entries),
+            "bytes": sum(e["size"] for e in self._entries.values()),
+            "max_bytes": self.max_bytes,
+        }
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_file(path: str, content: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+async def conditional_get(client: httpx.AsyncClient, cache: HttpCache, url: str, params: dict = None,
+                          get=None, ttl: float = None, negative_ttl: float = None, **kwargs) -> CachedResponse:
+    """GET through `cache`, revalidating with If-None-Match / If-Modified-Since.
+
+    `get` replaces client.get (e.g. a rate-limited wrapper) and is called
+    as get(url, params=..., headers=..., **kwargs). 200 responses are
+    stored, and 404s too when `negative_ttl` is given; anything else is
+    passed through uncached. An entry younger than its TTL is served
+    without a request at all.
+    """
+    key = cache.key(url, params)
+    cache.counters["requests"] += 1
+    entry = cache.lookup(key)
+    if entry is not None and cache.fresh(entry):
+        body = await cache.read_body(key)
+        if body is not None:
+            cache.counters["hits"] += 1
+            return CachedResponse(key, entry["status"], body, {}, entry["digest"], True,
+                                  entry.get("applied") != entry["digest"])
+        entry = None
+    base_headers = kwargs.pop("headers", None) or {}
+    headers = dict(base_headers)
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    fetch = get or client.get
+    resp = await fetch(url, params=params, headers=headers, **kwargs)
+
+    if resp.status_code == 304 and entry is not None:
+        body = await cache.read_body(key)
+        if body is not None:
+            cache.counters["revalidated"] += 1
+            cache.refresh(key, negative_ttl if entry["status"] == 404 else ttl)
+            changed = entry.get("applied") != entry["digest"]
+            if not changed:
+                cache.counters["unchanged"] += 1
+            return CachedResponse(key, entry["status"], body, dict(resp.headers), entry["digest"], True, changed)
+        # Lost the body: fetch again without validators
+        resp = await fetch(url, params=params, headers=base_headers, **kwargs)
+
+    if resp.status_code == 404 and negative_ttl:
+        cache.counters["misses"] += 1
+        await cache.store(key, 404, b"", resp.headers, "", ttl=negative_ttl)
+        return CachedResponse(key, 404, b"", dict(resp.headers), "", False, True)
+    if resp.status_code != 200:
+        cache.counters["misses"] += 1
+        return CachedResponse(key, resp.status_code, resp.content, dict(resp.headers), "", False, True)
+
+    content = resp.content
+    digest = hashlib.sha256(content).hexdigest()
+    cache.counters["misses"] += 1
+    changed = entry is None or entry.get("applied") != digest
+    if not changed:
+        cache.counters["unchanged"] += 1
+    await cache.store(key, resp.status_code, content, resp.headers, digest, ttl=ttl)
+    return CachedResponse(key, 200, content, dict(resp.headers), digest, False, changed)
+
+
+_caches = {}
+
+
+def get_cache(name: str, **kwargs) -> HttpCache:
+    """Process-wide cache instance per name."""
+    if name not in _caches:
+        _caches[name] = HttpCache(name, **kwargs)
+    return _caches[name]
+
+
+def cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+
+def flush_caches():
+    for cache in _caches.values():
+        cache.flush()
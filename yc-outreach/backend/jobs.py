@@ -0,0 +1,293 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from database import db_read, db_write
+from events import publish
+
+# Jobs running at once; the rest wait in "queued"
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", "2"))
+# Progress is kept in memory and written to the jobs row at most this often
+JOB_PROGRESS_INTERVAL = 2.0
+# Finished jobs older than this are deleted at startup
+JOB_RETENTION_DAYS = 30
+# Seconds a run lock lasts unless renewed; the owning process renews its locks every third of that
+LOCK_LEASE = float(os.environ.get("LOCK_LEASE", "30"))
+# Set when several server processes share the database. Otherwise every lock
+# another runner holds at startup is left by a process that has stopped, and
+# is released then rather than when its lease runs out up to LOCK_LEASE later.
+SHARED_RUN_LOCKS = os.environ.get("SHARED_RUN_LOCKS", "0") not in ("", "0")
+# How often a run waiting on another's lock checks whether it is free
+LOCK_POLL_INTERVAL = 1.0
+
+ACTIVE_STATES = ("queued", "running")
+
+_current_job = ContextVar("current_job", default=None)
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+class Job:
+    def __init__(self, job_id: str, kind: str, target: str = None):
+        self.id = job_id
+        self.kind = kind
+        self.target = target
+        self.progress = {}
+        self.task = None
+        self.saved_at = 0.0
+
+
+class JobRunner:
+    """Runs submitted coroutines as background tasks, JOB_CONCURRENCY at a time.
+
+    Every state change is written to the jobs table, so status and results
+    outlive the process; only live progress is held in memory between
+    writes.
+
+    Each job holds a run lock, a row in run_locks leased to this process
+    and renewed while it lives, from submit until it finishes. Submitting
+    work whose lock is taken returns the job holding it instead of
+    starting another. An active job whose lease has lapsed belonged to a
+    process that died, and is marked failed.
+    """
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY):
+        self.loop = asyncio.get_running_loop()
+        self.owner = uuid.uuid4().hex
+        self._slots = asyncio.Semaphore(concurrency)
+        self._live = {}  # id -> Job, while queued or running
+        self._heartbeat = asyncio.create_task(self._renew())
+
+    async def submit(self, kind: str, target: str, func, lock: str = None) -> dict:
+        """Queue `func()` (a coroutine function) under run lock `lock` (default: target or kind).
+
+        Returns the new job, or if the lock is taken the job holding it,
+        with "attached": true.
+        """
+        job = Job(uuid.uuid4().hex, kind, target)
+        async with db_write() as db:
+            holder = await self._take_lock(db, lock or target or kind, job.id)
+            if holder is None:
+                await db.execute(
+                    "INSERT INTO jobs (id, kind, target, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                    (job.id, kind, target, _now()),
+                )
+        if holder is not None:
+            return {**await self.get(holder), "attached": True}
+        publish("job", id=job.id, kind=kind, target=target, status="queued", error=None)
+        self._live[job.id] = job
+        job.task = asyncio.create_task(self._run(job, func))
+        return await self.get(job.id)
+
+    async def _run(self, job: Job, func):
+        _current_job.set(job)
+        try:
+            async with self._slots:
+                await self._save(job, status="running", started_at=_now())
+                result = await func()
+            await self._save(job, status="succeeded", result=json.dumps(result, default=str), finished_at=_now())
+        except asyncio.CancelledError:
+            await self._save(job, status="cancelled", finished_at=_now())
+        except Exception as e:
+            print(f"[jobs] {job.kind}{f' {job.target}' if job.target else ''} job {job.id} failed: {e}")
+            await self._save(job, status="failed", error=str(e)[:2000], finished_at=_now())
+        finally:
+            self._live.pop(job.id, None)
+            # After the final status, so anyone waiting on the lock sees it
+            async with db_write() as db:
+                await db.execute("DELETE FROM run_locks WHERE holder = ?", (job.id,))
+
+    async def _take_lock(self, db, name: str, holder: str):
+        """Lease lock `name` to `holder` inside the caller's transaction. Returns None, or the live holder."""
+        await expire_locks(db, name)
+        cursor = await db.execute(
+            "INSERT OR IGNORE INTO run_locks (name, holder, owner, acquired_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (name, holder, self.owner, _now(), time.time() + LOCK_LEASE),
+        )
+        if cursor.rowcount:
+            return None
+        cursor = await db.execute("SELECT holder FROM run_locks WHERE name = ?", (name,))
+        return (await cursor.fetchone())["holder"]
+
+    async def _renew(self):
+        while True:
+            await asyncio.sleep(LOCK_LEASE / 3)
+            try:
+                async with db_write() as db:
+                    await db.execute("UPDATE run_locks SET expires_at = ? WHERE owner = ?",
+                                     (time.time() + LOCK_LEASE, self.owner))
+                    await expire_locks(db)
+            except Exception as e:
+                print(f"[jobs] Lock renewal failed: {e}")
+
+    async def run_exclusive(self, lock: str, func):
+        """func() under run lock `lock`, for the job this task runs under.
+
+        If another run holds it, that run is waited for and reported
+        instead of doing the same work twice.
+        """
+        job = _current_job.get()
+        if job is None:
+            return await func()
+        async with db_write() as db:
+            holder = await self._take_lock(db, lock, job.id)
+        if holder is None:
+            try:
+                return await func()
+            finally:
+                async with db_write() as db:
+                    await db.execute("DELETE FROM run_locks WHERE name = ? AND holder = ?", (lock, job.id))
+        if holder == job.id:
+            return await func()
+        while await lock_holder(lock) == holder:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+        other = await self.get(holder)
+        return {"attached_to": holder, "status": other["status"] if other else None}
+
+    async def _save(self, job: Job, **fields):
+        if "status" in fields:
+            publish("job", id=job.id, kind=job.kind, target=job.target, status=fields["status"],
+                    error=fields.get("error"))
+        fields["progress"] = json.dumps(job.progress)
+        job.saved_at = time.monotonic()
+        async with db_write() as db:
+            await db.execute(
+                f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                (*fields.values(), job.id),
+            )
+
+    async def report(self, job: Job, fields: dict):
+        job.progress.update(fields)
+        if time.monotonic() - job.saved_at >= JOB_PROGRESS_INTERVAL:
+            await self._save(job)
+
+    async def get(self, job_id: str):
+        async with db_read() as db:
+            cursor = await db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        job = _job_dict(row)
+        live = self._live.get(job_id)
+        if live is not None:
+            job["progress"] = dict(live.progress)
+        return job
+
+    async def list(self, limit: int = 20, kind: str = None) -> list:
+        where, params = ("WHERE kind = ?", [kind]) if kind else ("", [])
+        async with db_read() as db:
+            cursor = await db.execute(
+                f"SELECT * FROM jobs {where} ORDER BY created_at DESC LIMIT ?", params + [limit]
+            )
+            jobs = [_job_dict(r) for r in await cursor.fetchall()]
+        for job in jobs:
+            live = self._live.get(job["id"])
+            if live is not None:
+                job["progress"] = dict(live.progress)
+        return jobs
+
+    async def cancel(self, job_id: str, timeout: float = 5.0):
+        """Cancel a queued or running job and wait (up to `timeout`) for it to stop."""
+        live = self._live.get(job_id)
+        if live is not None and not live.task.done():
+            live.task.cancel()
+            await asyncio.wait([live.task], timeout=timeout)
+        return await self.get(job_id)
+
+    async def close(self):
+        tasks = [job.task for job in self._live.values() if not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks, timeout=5.0)
+        self._heartbeat.cancel()
+        async with db_write() as db:
+            await db.execute("DELETE FROM run_locks WHERE owner = ?", (self.owner,))
+
+
+def _job_dict(row) -> dict:
+    job = dict(row)
+    for field in ("progress", "result"):
+        try:
+            job[field] = json.loads(job[field]) if job[field] else None
+        except ValueError:
+            pass
+    return job
+
+
+_runner: JobRunner = None
+
+
+def get_job_runner() -> JobRunner:
+    """Process-wide runner, bound to the running event loop like the connection pool."""
+    global _runner
+    if _runner is None or _runner.loop is not asyncio.get_running_loop():
+        _runner = JobRunner()
+    return _runner
+
+
+async def report_progress(**fields):
+    """Publish a progress event, and merge `fields` into the progress of the job this task runs under."""
+    job = _current_job.get()
+    publish("progress", job_id=job.id if job else None, **fields)
+    if job is not None:
+        await get_job_runner().report(job, fields)
+
+
+async def expire_locks(db, name: str = None) -> int:
+    """Drop lapsed run locks (only `name`'s, if given) and fail the active jobs left without one."""
+    now = time.time()
+    scope, params = ("AND name = ?", (name,)) if name else ("", ())
+    await db.execute(f"DELETE FROM run_locks WHERE expires_at < ? {scope}", (now, *params))
+    cursor = await db.execute(
+        f"UPDATE jobs SET status = 'failed', error = 'Interrupted: its process stopped', finished_at = ? "
+        f"WHERE status IN ({','.join('?' * len(ACTIVE_STATES))}) AND id NOT IN (SELECT holder FROM run_locks)",
+        (_now(), *ACTIVE_STATES),
+    )
+    if cursor.rowcount:
+        print(f"[jobs] Marked {cursor.rowcount} interrupted jobs as failed")
+    return cursor.rowcount
+
+
+async def lock_holder(name: str):
+    """The job id holding run lock `name`, or None."""
+    async with db_read() as db:
+        cursor = await db.execute("SELECT holder FROM run_locks WHERE name = ? AND expires_at >= ?", (name, time.time()))
+        row = await cursor.fetchone()
+    return row["holder"] if row else None
+
+
+async def list_locks() -> list:
+    async with db_read() as db:
+        cursor = await db.execute("SELECT * FROM run_locks WHERE expires_at >= ? ORDER BY name", (time.time(),))
+        return [dict(r) for r in await cursor.fetchall()]
+
+
+async def run_exclusive(lock: str, func):
+    return await get_job_runner().run_exclusive(lock, func)
+
+
+async def recover_jobs():
+    """Fail jobs a stopped process left active and drop old finished ones."""
+    owner = get_job_runner().owner
+    async with db_write() as db:
+        if not SHARED_RUN_LOCKS:
+            await db.execute("DELETE FROM run_locks WHERE owner != ?", (owner,))
+        await expire_locks(db)
+        await db.execute(
+            "DELETE FROM jobs WHERE finished_at < ?",
+            ((datetime.utcnow() - timedelta(days=JOB_RETENTION_DAYS)).isoformat(),),
+        )
+
+
+async def close_jobs():
+    global _runner
+    if _runner is not None:
+        if _runner.loop is asyncio.get_running_loop():
+            await _runner.close()
+        _runner = None
@@ -0,0 +1,202 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from database import db_read, db_write
+
+# A batch is written after this many seconds, or as soon as LOG_BATCH_SIZE entries are waiting
+LOG_FLUSH_INTERVAL = float(os.environ.get("LOG_FLUSH_INTERVAL", "0.5"))
+LOG_BATCH_SIZE = 200
+# Producers wait once this many entries are queued
+LOG_QUEUE_MAX = int(os.environ.get("LOG_QUEUE_MAX", "5000"))
+# Runs older than this are compacted into one summary row each at startup and
+# after each pipeline run. Unset or 0 keeps everything; compaction then only
+# happens through POST /api/agents/logs/compact.
+AGENT_LOG_RETENTION_DAYS = float(os.environ.get("AGENT_LOG_RETENTION_DAYS", "0"))
+# Actions that begin an agent run
+RUN_START_ACTIONS = ("start", "pipeline_start")
+SUMMARY_ACTION = "run_summary"
+
+
+class LogSink:
+    """Group-commit writer for agent_logs.
+
+    put() queues a row and a background task inserts the queue in
+    batches, one transaction each, so agents no longer take the writer and
+    commit for every line. Rows keep their queueing time as created_at.
+    put() and flush() wait on that task, which needs the writer: don't
+    call them while holding it.
+    """
+
+    def __init__(self, interval: float = LOG_FLUSH_INTERVAL, batch_size: int = LOG_BATCH_SIZE,
+                 max_queue: int = LOG_QUEUE_MAX):
+        self.loop = asyncio.get_running_loop()
+        self.interval = interval
+        self.batch_size = batch_size
+        # Write without waiting out the interval once this many are queued
+        self._threshold = min(batch_size, max_queue) if max_queue > 0 else batch_size
+        self._queue = asyncio.Queue(max_queue)
+        self._wake = asyncio.Event()
+        self._flushing = 0
+        self._task = None
+        self.counters = {"queued": 0, "written": 0, "batches": 0, "blocked": 0, "dropped": 0}
+
+    async def put(self, agent_name: str, action: str, details: str, company_id: int = None, status: str = "info"):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        if self._queue.full():
+            self.counters["blocked"] += 1
+        await self._queue.put((agent_name, action, details, company_id, status, datetime.utcnow().isoformat()))
+        self.counters["queued"] += 1
+        if self._queue.qsize() >= self._threshold:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            rows = [await self._queue.get()]
+            if self._queue.qsize() + 1 < self._threshold and not self._flushing:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            while len(rows) < self.batch_size and not self._queue.empty():
+                rows.append(self._queue.get_nowait())
+            try:
+                async with db_write() as db:
+                    await db.executemany(
+                        "INSERT INTO agent_logs (agent_name, action, details, company_id, status, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                self.counters["written"] += len(rows)
+                self.counters["batches"] += 1
+            except Exception as e:
+                self.counters["dropped"] += len(rows)
+                print(f"[logs] Dropped {len(rows)} agent log entries: {e}")
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    async def flush(self):
+        """Wait until everything queued so far is written."""
+        self._flushing += 1
+        self._wake.set()
+        try:
+            await self._queue.join()
+        finally:
+            self._flushing -= 1
+
+    async def close(self):
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {**self.counters, "pending": self._queue.qsize(), "batch_size": self.batch_size,
+                "interval_s": self.interval}
+
+
+_sink: LogSink = None
+
+
+def get_log_sink() -> LogSink:
+    """Process-wide sink, bound to the running event loop like the connection pool."""
+    global _sink
+    if _sink is None or _sink.loop is not asyncio.get_running_loop():
+        _sink = LogSink()
+    return _sink
+
+
+async def flush_logs():
+    if _sink is not None and _sink.loop is asyncio.get_running_loop():
+        await _sink.flush()
+
+
+async def close_log_sink():
+    global _sink
+    if _sink is not None:
+        if _sink.loop is asyncio.get_running_loop():
+            await _sink.close()
+        _sink = None
+
+
+def log_sink_stats() -> dict:
+    return _sink.stats() if _sink is not None else {}
+
+
+def _summarize(agent_name: str, run: list) -> tuple:
+    """One agent_logs row standing in for a run's rows."""
+    errors = sum(1 for r in run if r["status"] == "error")
+    last = run[-1]
+    details = (f"{len(run)} entries, {errors} errors, {run[0]['created_at']} to {last['created_at']}. "
+               f"Last: {last['action']}: {last['details'] or ''}")
+    return (agent_name, SUMMARY_ACTION, details[:2000], None, "error" if errors else last["status"], run[0]["created_at"])
+
+
+async def compact_agent_logs(retention_days: float = AGENT_LOG_RETENTION_DAYS) -> dict:
+    """Replace each finished run that started more than `retention_days` ago with a summary row.
+
+    A run is an agent's rows from one RUN_START_ACTIONS row up to the
+    next; an agent's latest run is never compacted. Older rows logged
+    before any start row count as one run.
+    """
+    if not retention_days:
+        return {"runs": 0, "removed": 0}
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).isoformat()
+    await flush_logs()
+    runs = removed = 0
+    async with db_read() as db:
+        cursor = await db.execute("SELECT DISTINCT agent_name FROM agent_logs")
+        agents = [r[0] for r in await cursor.fetchall()]
+    for agent_name in agents:
+        # Everything before the first run start that is not older than cutoff is compacted
+        async with db_read() as db:
+            cursor = await db.execute(f"""
+                SELECT created_at, id FROM agent_logs
+                WHERE agent_name = ? AND action IN ({",".join("?" * len(RUN_START_ACTIONS))}) AND created_at >= ?
+                ORDER BY created_at, id LIMIT 1
+            """, (agent_name, *RUN_START_ACTIONS, cutoff))
+            boundary = await cursor.fetchone()
+        if boundary is None:
+            # No recent run: keep the last one whole
+            async with db_read() as db:
+                cursor = await db.execute(f"""
+                    SELECT created_at, id FROM agent_logs
+                    WHERE agent_name = ? AND action IN ({",".join("?" * len(RUN_START_ACTIONS))})
+                    ORDER BY created_at DESC, id DESC LIMIT 1
+                """, (agent_name, *RUN_START_ACTIONS))
+                boundary = await cursor.fetchone()
+        if boundary is None:
+            continue
+        scope = "agent_name = ? AND action != ? AND (created_at, id) < (?, ?)"
+        params = (agent_name, SUMMARY_ACTION, boundary["created_at"], boundary["id"])
+        async with db_write() as db:
+            cursor = await db.execute(
+                f"SELECT action, details, status, created_at FROM agent_logs WHERE {scope} ORDER BY created_at, id",
+                params,
+            )
+            summaries, run = [], []
+            async for r in cursor:
+                if r["action"] in RUN_START_ACTIONS and run:
+                    summaries.append(_summarize(agent_name, run))
+                    run = []
+                run.append(r)
+            if run:
+                summaries.append(_summarize(agent_name, run))
+            if not summaries:
+                continue
+            cursor = await db.execute(f"DELETE FROM agent_logs WHERE {scope}", params)
+            removed += cursor.rowcount
+            await db.executemany(
+                "INSERT INTO agent_logs (agent_name, action, details, company_id, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                summaries,
+            )
+            runs += len(summaries)
+    if runs:
+        print(f"[logs] Compacted {removed} agent log entries into {runs} run summaries")
+    return {"runs": runs, "removed": removed}
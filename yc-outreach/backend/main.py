@@ -1,23 +1,44 @@
 import json
 import asyncio
+import sqlite3
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional
-from database import init_db, get_db, is_db_empty
+from database import init_db, db_read, db_write, is_db_empty, close_pool, pool_metrics, fts_query, facet_filter, SEARCH_WEIGHTS
 from scraper import scrape_all
-from email_generator import generate_emails
+from http_cache import cache_stats, flush_caches
+from profile_parser import close_parser_pool
+from jobs import get_job_runner, recover_jobs, close_jobs, list_locks
+from scheduler import start_scheduler, stop_scheduler, schedule_status
+from events import sse_stream
+from log_sink import close_log_sink, log_sink_stats, compact_agent_logs, AGENT_LOG_RETENTION_DAYS
+from email_generator import DRAFT_FIELDS
+from draft_cache import draft_cache
+from stats import get_dashboard_stats, check_stats
+from scoring import FEATURES, DEFAULT_WEIGHTS, get_weights, set_weights, preview_weights, rescore_companies
+from pagination import order_clause, decode_cursor, seek_query, count_rows, page_result
 from agents import ScoutAgent, ReconAgent, WriterAgent, TrackerAgent, OrchestratorAgent
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    await recover_jobs()
     if await is_db_empty():
-        print("[startup] DB empty, running initial scrape...")
-        count = await scrape_all()
-        print(f"[startup] Scraped {count} companies")
+        # A background job like /api/scrape, so the server takes requests while it runs
+        job = await get_job_runner().submit("scrape", None, scrape_all)
+        print(f"[startup] DB empty, initial scrape running as job {job['id']}")
+    await compact_agent_logs()
+    start_scheduler(submit_agent, [*AGENT_MAP, "all"])
     yield
+    await stop_scheduler()
+    await close_jobs()
+    flush_caches()
+    close_parser_pool()
+    await close_log_sink()
+    await close_pool()
 
 app = FastAPI(title="YC Outreach API", lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["http://localhost:5173", "http://127.0.0.1:5173"], allow_methods=["*"], allow_headers=["*"])
@@ -52,6 +73,9 @@ class OutreachUpdate(BaseModel):
     notes: Optional[str] = None
     sent_at: Optional[str] = None
 
+class ScoringProfile(BaseModel):
+    weights: dict[str, int]
+
 def row_to_dict(row):
     if row is None:
         return None
@@ -63,61 +87,95 @@ async def list_companies(
     batch: Optional[str] = None,
     industry: Optional[str] = None,
     tag: Optional[str] = None,
+    location: Optional[str] = None,
+    match: str = Query("any", pattern="^(any|all)$"),
     is_hiring: Optional[bool] = None,
     search: Optional[str] = None,
     status: Optional[str] = None,
     sort_by: Optional[str] = None,
+    highlight: bool = False,
+    cursor: Optional[str] = None,
+    count: Optional[str] = Query(None, pattern="^(exact|approx|none)$"),
     page: int = Query(1, ge=1),
     per_page: int = Query(30, ge=1, le=100),
 ):
-    db = await get_db()
     conditions = []
     params = []
+    joins = []
+    join_params = []
+    keys = [("c.relevance_score", "DESC", "relevance_score")] if sort_by == "relevance" else []
+    extra_cols = ""
 
     if batch:
         batches = [b.strip() for b in batch.split(",")]
         placeholders = ",".join("?" * len(batches))
         conditions.append(f"c.batch IN ({placeholders})")
         params.extend(batches)
-    if industry:
-        conditions.append("c.industries LIKE ?")
-        params.append(f"%{industry}%")
-    if tag:
-        conditions.append("c.tags LIKE ?")
-        params.append(f"%{tag}%")
+    # Industries and tags are comma-separated; locations contain commas, so
+    # they are "|"-separated and match as prefixes. `match` picks any-of or
+    # all-of within each facet.
+    for column, value, sep in (("industries", industry, ","), ("tags", tag, ","), ("locations", location, "|")):
+        values = [v for v in (value or "").split(sep) if v.strip()]
+        if values:
+            sql, facet_params = facet_filter(column, values, match, prefix=column == "locations")
+            conditions.append(sql)
+            params.extend(facet_params)
     if is_hiring is not None:
         conditions.append("c.is_hiring = ?")
         params.append(1 if is_hiring else 0)
-    if search:
-        conditions.append("(c.name LIKE ? OR c.one_liner LIKE ? OR c.long_description LIKE ?)")
-        s = f"%{search}%"
-        params.extend([s, s, s])
-    
-    join_clause = ""
+    fts_match = fts_query(search)
+    if fts_match:
+        # Ranked FTS5 lookup instead of LIKE scans over the text columns
+        snippet_sql = ", snippet(companies_fts, -1, '<mark>', '</mark>', '…', 12) AS snippet" if highlight else ""
+        joins.append(f"""
+            INNER JOIN (
+                SELECT rowid, bm25(companies_fts, {", ".join(map(str, SEARCH_WEIGHTS))}) AS rank{snippet_sql}
+                FROM companies_fts WHERE companies_fts MATCH ?
+            ) f ON f.rowid = c.id""")
+        join_params.append(fts_match)
+        keys.append(("f.rank", "ASC", "search_rank"))
+        extra_cols += ", f.rank AS search_rank"
+        if highlight:
+            extra_cols += ", f.snippet AS search_snippet"
+
     if status:
-        join_clause = "INNER JOIN outreach o ON o.company_id = c.id"
-        conditions.append("o.status = ?")
+        # Current pipeline status (latest outreach row), kept on companies by triggers
+        conditions.append("c.outreach_status = ?")
         params.append(status)
 
+    join_clause = " ".join(joins)
+    params = join_params + params
+    keys.extend([("c.is_hiring", "DESC", "is_hiring"), ("c.name", "ASC", "name"), ("c.id", "ASC", "id")])
+
     where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
-    
-    count_sql = f"SELECT COUNT(DISTINCT c.id) FROM companies c {join_clause} {where}"
-    cursor = await db.execute(count_sql, params)
-    total = (await cursor.fetchone())[0]
-
-    offset = (page - 1) * per_page
-    data_sql = f"""
-        SELECT DISTINCT c.*, 
-            (SELECT o2.status FROM outreach o2 WHERE o2.company_id = c.id ORDER BY o2.updated_at DESC LIMIT 1) as outreach_status,
-            (SELECT COUNT(*) FROM contacts ct WHERE ct.company_id = c.id) as contact_count
-        FROM companies c {join_clause} {where}
-        ORDER BY {"c.relevance_score DESC," if sort_by == "relevance" else ""} c.is_hiring DESC, c.name ASC
-        LIMIT ? OFFSET ?
-    """
-    cursor = await db.execute(data_sql, params + [per_page, offset])
-    rows = await cursor.fetchall()
-    companies = [dict(r) for r in rows]
-    
+
+    def data_sql(seek=None, limit_sql="LIMIT ?"):
+        page_where = ("WHERE " + " AND ".join(conditions + [seek])) if seek else where
+        return f"""
+            SELECT c.*{extra_cols}
+            FROM companies c {join_clause} {page_where}
+            ORDER BY {order_clause(keys)}
+            {limit_sql}
+        """
+
+    # Cursor mode seeks past the last row instead of using OFFSET, so every page costs the same
+    after = decode_cursor(cursor, keys) if cursor is not None else None
+    if after is not None:
+        sql, sql_params = seek_query(data_sql, keys, after, params, per_page + 1)
+    elif cursor is not None:
+        sql, sql_params = data_sql(), params + [per_page + 1]
+    else:
+        sql, sql_params = data_sql(limit_sql="LIMIT ? OFFSET ?"), params + [per_page, (page - 1) * per_page]
+    count_mode = count or ("none" if cursor is not None else "exact")
+    async with db_read() as db:
+        total, total_exact = await count_rows(db, f"SELECT c.id FROM companies c {join_clause} {where}", params, count_mode)
+        rows = await db.execute(sql, sql_params)
+        companies = [dict(r) for r in await rows.fetchall()]
+
+    next_cursor = None
+    if cursor is not None:
+        companies, next_cursor = page_result(companies, keys, per_page)
+
     for co in companies:
         for field in ["industries", "tags", "locations"]:
             try:
@@ -125,31 +183,30 @@ async def list_companies(
             except:
                 co[field] = []
 
-    await db.close()
-    return {"companies": companies, "total": total, "page": page, "per_page": per_page, "pages": (total + per_page - 1) // per_page}
+    if cursor is not None:
+        return {"companies": companies, "total": total, "total_exact": total_exact, "per_page": per_page, "next_cursor": next_cursor}
+    pages = (total + per_page - 1) // per_page if total is not None else None
+    return {"companies": companies, "total": total, "total_exact": total_exact, "page": page, "per_page": per_page, "pages": pages}
 
 @app.get("/api/companies/{company_id}")
 async def get_company(company_id: int):
-    db = await get_db()
-    cursor = await db.execute("SELECT * FROM companies WHERE id = ?", (company_id,))
-    company = row_to_dict(await cursor.fetchone())
-    if not company:
-        await db.close()
-        raise HTTPException(404, "Company not found")
-    
+    async with db_read() as db:
+        cursor = await db.execute("SELECT * FROM companies WHERE id = ?", (company_id,))
+        company = row_to_dict(await cursor.fetchone())
+        if not company:
+            raise HTTPException(404, "Company not found")
+
+        cursor = await db.execute("SELECT * FROM contacts WHERE company_id = ? ORDER BY created_at DESC", (company_id,))
+        company["contacts"] = [dict(r) for r in await cursor.fetchall()]
+
+        cursor = await db.execute("SELECT * FROM outreach WHERE company_id = ? ORDER BY updated_at DESC", (company_id,))
+        company["outreach"] = [dict(r) for r in await cursor.fetchall()]
+
     for field in ["industries", "tags", "locations"]:
         try:
             company[field] = json.loads(company[field]) if company[field] else []
         except:
             company[field] = []
-
-    cursor = await db.execute("SELECT * FROM contacts WHERE company_id = ? ORDER BY created_at DESC", (company_id,))
-    company["contacts"] = [dict(r) for r in await cursor.fetchall()]
-    
-    cursor = await db.execute("SELECT * FROM outreach WHERE company_id = ? ORDER BY updated_at DESC", (company_id,))
-    company["outreach"] = [dict(r) for r in await cursor.fetchall()]
-    
-    await db.close()
     return company
 
 # --- Contacts ---
@@ -158,12 +215,14 @@ async def list_contacts(
     company_id: Optional[int] = None,
     source: Optional[str] = None,
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count: Optional[str] = Query(None, pattern="^(exact|approx|none)$"),
     page: int = Query(1, ge=1),
     per_page: int = Query(30, ge=1, le=100),
 ):
-    db = await get_db()
     conditions = []
     params = []
+    keys = [("c.created_at", "DESC", "created_at"), ("c.id", "DESC", "id")]
 
     if company_id is not None:
         conditions.append("c.company_id = ?")
@@ -175,222 +234,180 @@ async def list_contacts(
         conditions.append("(c.name LIKE ? OR c.email LIKE ? OR c.role LIKE ?)")
         s = f"%{search}%"
         params.extend([s, s, s])
-    
+
     where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
-    
-    count_sql = f"SELECT COUNT(*) FROM contacts c {where}"
-    cursor = await db.execute(count_sql, params)
-    total = (await cursor.fetchone())[0]
-
-    offset = (page - 1) * per_page
-    data_sql = f"""
-        SELECT c.*, co.name as company_name 
-        FROM contacts c 
-        JOIN companies co ON c.company_id = co.id
-        {where}
-        ORDER BY c.created_at DESC
-        LIMIT ? OFFSET ?
-    """
-    cursor = await db.execute(data_sql, params + [per_page, offset])
-    rows = await cursor.fetchall()
-    contacts = [dict(r) for r in rows]
-    
-    await db.close()
-    return {"contacts": contacts, "total": total, "page": page, "per_page": per_page, "pages": (total + per_page - 1) // per_page}
+
+    def data_sql(seek=None, limit_sql="LIMIT ?"):
+        page_where = ("WHERE " + " AND ".join(conditions + [seek])) if seek else where
+        return f"""
+            SELECT c.*, co.name as company_name 
+            FROM contacts c 
+            JOIN companies co ON c.company_id = co.id
+            {page_where}
+            ORDER BY {order_clause(keys)}
+            {limit_sql}
+        """
+
+    after = decode_cursor(cursor, keys) if cursor is not None else None
+    if after is not None:
+        sql, sql_params = seek_query(data_sql, keys, after, params, per_page + 1)
+    elif cursor is not None:
+        sql, sql_params = data_sql(), params + [per_page + 1]
+    else:
+        sql, sql_params = data_sql(limit_sql="LIMIT ? OFFSET ?"), params + [per_page, (page - 1) * per_page]
+    count_mode = count or ("none" if cursor is not None else "exact")
+    async with db_read() as db:
+        total, total_exact = await count_rows(db, f"SELECT c.id FROM contacts c {where}", params, count_mode)
+        rows = await db.execute(sql, sql_params)
+        contacts = [dict(r) for r in await rows.fetchall()]
+
+    if cursor is not None:
+        contacts, next_cursor = page_result(contacts, keys, per_page)
+        return {"contacts": contacts, "total": total, "total_exact": total_exact, "per_page": per_page, "next_cursor": next_cursor}
+    pages = (total + per_page - 1) // per_page if total is not None else None
+    return {"contacts": contacts, "total": total, "total_exact": total_exact, "page": page, "per_page": per_page, "pages": pages}
 
 @app.post("/api/contacts")
 async def create_contact(data: ContactCreate):
-    db = await get_db()
-    cursor = await db.execute(
-        "INSERT INTO contacts (company_id, name, role, email, linkedin_url, source) VALUES (?, ?, ?, ?, ?, ?)",
-        (data.company_id, data.name, data.role, data.email, data.linkedin_url, data.source)
-    )
-    await db.commit()
-    contact_id = cursor.lastrowid
-    cursor = await db.execute("SELECT * FROM contacts WHERE id = ?", (contact_id,))
-    result = dict(await cursor.fetchone())
-    await db.close()
+    async with db_write() as db:
+        try:
+            cursor = await db.execute(
+                "INSERT INTO contacts (company_id, name, role, email, linkedin_url, source) VALUES (?, ?, ?, ?, ?, ?)",
+                (data.company_id, data.name, data.role, data.email, data.linkedin_url, data.source)
+            )
+        except sqlite3.IntegrityError:
+            raise HTTPException(409, "Contact already exists for this company")
+        contact_id = cursor.lastrowid
+        cursor = await db.execute("SELECT * FROM contacts WHERE id = ?", (contact_id,))
+        result = dict(await cursor.fetchone())
     return result
 
 @app.put("/api/contacts/{contact_id}")
 async def update_contact(contact_id: int, data: ContactUpdate):
-    db = await get_db()
     fields, values = [], []
     for k, v in data.model_dump(exclude_none=True).items():
         fields.append(f"{k} = ?")
         values.append(v)
     if not fields:
-        await db.close()
         raise HTTPException(400, "No fields to update")
     values.append(contact_id)
-    await db.execute(f"UPDATE contacts SET {', '.join(fields)} WHERE id = ?", values)
-    await db.commit()
-    cursor = await db.execute("SELECT * FROM contacts WHERE id = ?", (contact_id,))
-    result = row_to_dict(await cursor.fetchone())
-    await db.close()
+    async with db_write() as db:
+        try:
+            await db.execute(f"UPDATE contacts SET {', '.join(fields)} WHERE id = ?", values)
+        except sqlite3.IntegrityError:
+            raise HTTPException(409, "Another contact of this company has that email or name and source")
+        cursor = await db.execute("SELECT * FROM contacts WHERE id = ?", (contact_id,))
+        result = row_to_dict(await cursor.fetchone())
     if not result:
         raise HTTPException(404)
     return result
 
 @app.delete("/api/contacts/{contact_id}")
 async def delete_contact(contact_id: int):
-    db = await get_db()
-    await db.execute("DELETE FROM contacts WHERE id = ?", (contact_id,))
-    await db.commit()
-    await db.close()
+    async with db_write() as db:
+        await db.execute("DELETE FROM contacts WHERE id = ?", (contact_id,))
     return {"ok": True}
 
 # --- Email Generator ---
 @app.post("/api/companies/{company_id}/generate-email")
 async def gen_email(company_id: int):
-    db = await get_db()
-    cursor = await db.execute("SELECT * FROM companies WHERE id = ?", (company_id,))
-    company = row_to_dict(await cursor.fetchone())
-    await db.close()
+    async with db_read() as db:
+        cursor = await db.execute(f"SELECT id, {', '.join(DRAFT_FIELDS)} FROM companies WHERE id = ?", (company_id,))
+        company = row_to_dict(await cursor.fetchone())
     if not company:
         raise HTTPException(404)
-    return {"emails": generate_emails(company)}
+    return {"emails": await draft_cache.get(company)}
+
+@app.get("/api/drafts/cache")
+async def get_draft_cache_stats():
+    return draft_cache.stats()
 
 # --- Outreach ---
 @app.post("/api/outreach")
 async def create_outreach(data: OutreachCreate):
-    db = await get_db()
-    cursor = await db.execute(
-        "INSERT INTO outreach (company_id, contact_id, status, email_draft, notes) VALUES (?, ?, ?, ?, ?)",
-        (data.company_id, data.contact_id, data.status, data.email_draft, data.notes)
-    )
-    await db.commit()
-    oid = cursor.lastrowid
-    cursor = await db.execute("SELECT * FROM outreach WHERE id = ?", (oid,))
-    result = dict(await cursor.fetchone())
-    await db.close()
+    async with db_write() as db:
+        cursor = await db.execute(
+            "INSERT INTO outreach (company_id, contact_id, status, email_draft, notes) VALUES (?, ?, ?, ?, ?)",
+            (data.company_id, data.contact_id, data.status, data.email_draft, data.notes)
+        )
+        oid = cursor.lastrowid
+        cursor = await db.execute("SELECT * FROM outreach WHERE id = ?", (oid,))
+        result = dict(await cursor.fetchone())
     return result
 
 @app.patch("/api/outreach/{outreach_id}")
 async def update_outreach(outreach_id: int, data: OutreachUpdate):
-    db = await get_db()
     fields, values = ["updated_at = CURRENT_TIMESTAMP"], []
     for k, v in data.model_dump(exclude_none=True).items():
         fields.append(f"{k} = ?")
         values.append(v)
+    if data.email_draft is not None:
+        fields.append("draft_hash = NULL")  # edited by hand: WriterAgent leaves it alone
     values.append(outreach_id)
-    await db.execute(f"UPDATE outreach SET {', '.join(fields)} WHERE id = ?", values)
-    await db.commit()
-    cursor = await db.execute("SELECT * FROM outreach WHERE id = ?", (outreach_id,))
-    result = row_to_dict(await cursor.fetchone())
-    await db.close()
+    async with db_write() as db:
+        await db.execute(f"UPDATE outreach SET {', '.join(fields)} WHERE id = ?", values)
+        cursor = await db.execute("SELECT * FROM outreach WHERE id = ?", (outreach_id,))
+        result = row_to_dict(await cursor.fetchone())
     if not result:
         raise HTTPException(404)
     return result
 
 @app.delete("/api/outreach/{outreach_id}")
 async def delete_outreach(outreach_id: int):
-    db = await get_db()
-    await db.execute("DELETE FROM outreach WHERE id = ?", (outreach_id,))
-    await db.commit()
-    await db.close()
+    async with db_write() as db:
+        await db.execute("DELETE FROM outreach WHERE id = ?", (outreach_id,))
     return {"ok": True}
 
 # --- Stats ---
 @app.get("/api/stats")
 async def get_stats():
-    db = await get_db()
-    
-    cursor = await db.execute("SELECT COUNT(*) FROM companies")
-    total = (await cursor.fetchone())[0]
-    
-    cursor = await db.execute("SELECT batch, COUNT(*) as count FROM companies GROUP BY batch ORDER BY batch")
-    by_batch = {r["batch"]: r["count"] for r in await cursor.fetchall()}
-    
-    cursor = await db.execute("SELECT COUNT(*) FROM companies WHERE industries LIKE '%AI%' OR industries LIKE '%Machine Learning%' OR tags LIKE '%AI%' OR one_liner LIKE '%AI %' OR one_liner LIKE '%machine learning%'")
-    ai_count = (await cursor.fetchone())[0]
-    
-    cursor = await db.execute("SELECT status, COUNT(*) as count FROM outreach GROUP BY status")
-    outreach_by_status = {r["status"]: r["count"] for r in await cursor.fetchall()}
-    
-    total_outreach = sum(outreach_by_status.values())
-    replied = outreach_by_status.get("replied", 0) + outreach_by_status.get("interview", 0)
-    sent = outreach_by_status.get("sent", 0) + replied
-    response_rate = round((replied / sent * 100), 1) if sent > 0 else 0
-    
-    cursor = await db.execute("""
-        SELECT o.*, c.name as company_name, c.batch as company_batch 
-        FROM outreach o JOIN companies c ON c.id = o.company_id 
-        ORDER BY o.updated_at DESC LIMIT 10
-    """)
-    recent = [dict(r) for r in await cursor.fetchall()]
-    
-    cursor = await db.execute("""
-        SELECT o.*, c.name as company_name, c.batch as company_batch
-        FROM outreach o JOIN companies c ON c.id = o.company_id
-        WHERE o.status = 'sent' AND o.sent_at IS NOT NULL 
-        AND datetime(o.sent_at) < datetime('now', '-3 days')
-        ORDER BY o.sent_at ASC LIMIT 10
-    """)
-    follow_ups = [dict(r) for r in await cursor.fetchall()]
-    
-    cursor = await db.execute("SELECT COUNT(*) FROM companies WHERE is_hiring = 1")
-    hiring_count = (await cursor.fetchone())[0]
-    
-    # Agent stats
-    cursor = await db.execute("SELECT COUNT(*) FROM companies WHERE relevance_score > 0")
-    scored_count = (await cursor.fetchone())[0]
-
-    cursor = await db.execute("SELECT COUNT(*) FROM contacts WHERE source = 'recon_agent'")
-    recon_contacts = (await cursor.fetchone())[0]
-
-    # Top matches by relevance
-    cursor = await db.execute("""
-        SELECT id, name, slug, one_liner, batch, relevance_score, is_hiring, logo_url, industries, locations
-        FROM companies WHERE relevance_score > 0
-        ORDER BY relevance_score DESC LIMIT 10
-    """)
-    top_matches = []
-    for r in await cursor.fetchall():
-        d = dict(r)
-        for field in ["industries", "locations"]:
-            try:
-                d[field] = json.loads(d[field]) if d[field] else []
-            except:
-                d[field] = []
-        top_matches.append(d)
-
-    cursor = await db.execute("SELECT created_at FROM agent_logs ORDER BY created_at DESC LIMIT 1")
-    last_agent_row = await cursor.fetchone()
-    last_agent_run = last_agent_row["created_at"] if last_agent_row else None
-
-    await db.close()
-    # Contact sources breakdown
-    cursor = await db.execute("SELECT source, COUNT(*) as count FROM contacts GROUP BY source")
-    contacts_by_source = {r["source"]: r["count"] for r in await cursor.fetchall()}
-    
-    # Total contacts
-    cursor = await db.execute("SELECT COUNT(*) FROM contacts")
-    total_contacts = (await cursor.fetchone())[0]
-    
-    return {
-        "total_companies": total,
-        "ai_companies": ai_count,
-        "hiring_companies": hiring_count,
-        "by_batch": by_batch,
-        "outreach_by_status": outreach_by_status,
-        "total_outreach": total_outreach,
-        "response_rate": response_rate,
-        "recent_activity": recent,
-        "needs_follow_up": follow_ups,
-        "companies_scored": scored_count,
-        "recon_contacts": recon_contacts,
-        "top_matches": top_matches,
-        "last_agent_run": last_agent_run,
-        "contacts_by_source": contacts_by_source,
-        "total_contacts": total_contacts
-    }
+    return await get_dashboard_stats()
+
+@app.get("/api/stats/check")
+async def check_stats_consistency():
+    return await check_stats()
+
+@app.post("/api/stats/rebuild")
+async def rebuild_stats():
+    return await check_stats(repair=True)
 
 # --- Scrape ---
-@app.post("/api/scrape")
+@app.post("/api/scrape", status_code=202)
 async def trigger_scrape():
-    count = await scrape_all()
-    return {"scraped": count}
+    async def scrape():
+        result = await scrape_all()
+        return {"scraped": result["total"], **result}
+    # Scout scrapes too: one lock, so a scrape and a scout run never overlap
+    return await get_job_runner().submit("scrape", None, scrape, lock="scout")
+
+@app.get("/api/http-cache")
+async def get_http_cache_stats():
+    return cache_stats()
+
+# --- Scoring ---
+@app.get("/api/scoring/profile")
+async def get_scoring_profile():
+    async with db_read() as db:
+        weights = await get_weights(db)
+    return {"features": FEATURES, "weights": weights, "defaults": DEFAULT_WEIGHTS}
+
+@app.put("/api/scoring/profile")
+async def update_scoring_profile(profile: ScoringProfile):
+    try:
+        return await set_weights(profile.weights)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+@app.post("/api/scoring/preview")
+async def preview_scoring_profile(profile: ScoringProfile, limit: int = Query(20, ge=1, le=200)):
+    try:
+        return {"weights": profile.weights, "companies": await preview_weights(profile.weights, limit)}
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+@app.post("/api/scoring/rebuild")
+async def rebuild_scoring_features():
+    return await rescore_companies(full=True)
 
 # --- Agents ---
 AGENT_MAP = {
@@ -400,89 +417,139 @@ AGENT_MAP = {
     "tracker": TrackerAgent,
 }
 
-@app.post("/api/agents/run")
+async def submit_agent(agent_name: str) -> dict:
+    """Queue a run of one agent, or "all" for the pipeline; joins the run already in flight if there is one."""
+    agent = OrchestratorAgent() if agent_name == "all" else AGENT_MAP[agent_name]()
+    return await get_job_runner().submit("agent", agent_name, agent.run)
+
+@app.post("/api/agents/run", status_code=202)
 async def run_all_agents():
-    orchestrator = OrchestratorAgent()
-    results = await orchestrator.run()
-    return results
+    return await submit_agent("all")
 
-@app.post("/api/agents/run/{agent_name}")
+@app.post("/api/agents/run/{agent_name}", status_code=202)
 async def run_single_agent(agent_name: str):
-    cls = AGENT_MAP.get(agent_name)
-    if not cls:
+    if agent_name not in AGENT_MAP:
         raise HTTPException(400, f"Unknown agent: {agent_name}")
-    agent = cls()
-    result = await agent.run()
-    return result
+    return await submit_agent(agent_name)
+
+@app.get("/api/agents/schedule")
+async def get_agent_schedule():
+    return {"schedule": schedule_status(), "locks": await list_locks()}
+
+# --- Jobs ---
+@app.get("/api/jobs")
+async def list_jobs(kind: Optional[str] = None, limit: int = Query(20, ge=1, le=200)):
+    return {"jobs": await get_job_runner().list(limit, kind)}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await get_job_runner().get(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    job = await get_job_runner().cancel(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job
 
 @app.get("/api/agents/logs")
 async def get_agent_logs(
     agent_name: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count: Optional[str] = Query(None, pattern="^(exact|approx|none)$"),
     limit: int = Query(50, ge=1, le=500),
     offset: int = Query(0, ge=0),
 ):
-    db = await get_db()
     conditions = []
     params = []
+    keys = [("created_at", "DESC", "created_at"), ("id", "DESC", "id")]
     if agent_name:
         conditions.append("agent_name = ?")
         params.append(agent_name)
+
     where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
-    cursor = await db.execute(f"SELECT COUNT(*) FROM agent_logs {where}", params)
-    total = (await cursor.fetchone())[0]
-    cursor = await db.execute(
-        f"SELECT * FROM agent_logs {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
-        params + [limit, offset]
+
+    def data_sql(seek=None, limit_sql="LIMIT ?"):
+        page_where = ("WHERE " + " AND ".join(conditions + [seek])) if seek else where
+        return f"SELECT * FROM agent_logs {page_where} ORDER BY {order_clause(keys)} {limit_sql}"
+
+    after = decode_cursor(cursor, keys) if cursor is not None else None
+    if after is not None:
+        sql, sql_params = seek_query(data_sql, keys, after, params, limit + 1)
+    elif cursor is not None:
+        sql, sql_params = data_sql(), params + [limit + 1]
+    else:
+        sql, sql_params = data_sql(limit_sql="LIMIT ? OFFSET ?"), params + [limit, offset]
+    count_mode = count or ("none" if cursor is not None else "exact")
+    async with db_read() as db:
+        total, total_exact = await count_rows(db, f"SELECT id FROM agent_logs {where}", params, count_mode)
+        rows = await db.execute(sql, sql_params)
+        logs = [dict(r) for r in await rows.fetchall()]
+
+    if cursor is not None:
+        logs, next_cursor = page_result(logs, keys, limit)
+        return {"logs": logs, "total": total, "total_exact": total_exact, "next_cursor": next_cursor}
+    return {"logs": logs, "total": total, "total_exact": total_exact}
+
+@app.get("/api/agents/stream")
+async def agent_stream(request: Request, last_event_id: Optional[str] = None):
+    """Live log, progress and job events as Server-Sent Events; resumes after Last-Event-ID."""
+    resume = request.headers.get("last-event-id") or last_event_id
+    return StreamingResponse(
+        sse_stream(resume), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    logs = [dict(r) for r in await cursor.fetchall()]
-    await db.close()
-    return {"logs": logs, "total": total}
 
 @app.get("/api/agents/status")
 async def get_agent_status():
-    db = await get_db()
     agents = ["scout", "recon", "writer", "tracker", "orchestrator"]
-    status = {}
-    for a in agents:
-        cursor = await db.execute(
-            "SELECT created_at FROM agent_logs WHERE agent_name = ? ORDER BY created_at DESC LIMIT 1", (a,)
-        )
-        row = await cursor.fetchone()
-        status[a] = {"last_run": row["created_at"] if row else None}
-
-    # Summary stats
-    cursor = await db.execute("SELECT COUNT(*) FROM agent_logs")
-    total_runs = (await cursor.fetchone())[0]
-
-    cursor = await db.execute("SELECT COUNT(*) FROM companies WHERE relevance_score > 0")
-    scored = (await cursor.fetchone())[0]
-
-    cursor = await db.execute("SELECT COUNT(*) FROM contacts")
-    recon_contacts = (await cursor.fetchone())[0]
-
-    cursor = await db.execute("SELECT source, COUNT(*) as cnt FROM contacts GROUP BY source")
-    contacts_by_source = {r["source"]: r["cnt"] for r in await cursor.fetchall()}
-
-    cursor = await db.execute("""
-        SELECT COUNT(DISTINCT company_id) FROM contacts 
-        WHERE source IN ('yc_profile', 'github', 'email_pattern', 'linkedin_search')
-    """)
-    companies_enriched = (await cursor.fetchone())[0]
-
-    cursor = await db.execute("SELECT COUNT(*) FROM outreach WHERE needs_followup = 1")
-    followups = (await cursor.fetchone())[0]
-
-    await db.close()
+    # One statement: a MAX per agent off idx_agent_logs_agent_created, the
+    # trigger-maintained counters, and the one count that has no counter
+    async with db_read() as db:
+        cursor = await db.execute(f"""
+            SELECT 'last_run' AS metric, a.column1 AS bucket,
+                   (SELECT MAX(created_at) FROM agent_logs WHERE agent_name = a.column1) AS value
+            FROM (VALUES {", ".join(["(?)"] * len(agents))}) a
+            UNION ALL
+            SELECT metric, bucket, value FROM stat_counters
+            WHERE metric IN ('agent_logs', 'companies_scored', 'contacts', 'contacts_by_source', 'outreach_followup')
+            UNION ALL
+            SELECT 'companies_enriched', '', COUNT(DISTINCT company_id) FROM contacts
+            WHERE source IN ('yc_profile', 'github', 'email_pattern', 'linkedin_search')
+        """, agents)
+        rows = await cursor.fetchall()
+    status = {a: {"last_run": None} for a in agents}
+    counters, contacts_by_source = {}, {}
+    for metric, bucket, value in rows:
+        if metric == "last_run":
+            status[bucket]["last_run"] = value
+        elif metric == "contacts_by_source":
+            if value:
+                contacts_by_source[bucket or None] = value
+        else:
+            counters[metric] = value
     return {
         "agents": status,
-        "total_log_entries": total_runs,
-        "companies_scored": scored,
-        "recon_contacts": recon_contacts,
+        "total_log_entries": counters.get("agent_logs", 0),
+        "companies_scored": counters.get("companies_scored", 0),
+        "recon_contacts": counters.get("contacts", 0),
         "contacts_by_source": contacts_by_source,
-        "companies_enriched": companies_enriched,
-        "needs_followup": followups,
+        "companies_enriched": counters.get("companies_enriched", 0),
+        "needs_followup": counters.get("outreach_followup", 0),
     }
 
+@app.post("/api/agents/logs/compact")
+async def compact_logs(retention_days: float = Query(AGENT_LOG_RETENTION_DAYS or 30, gt=0)):
+    return await compact_agent_logs(retention_days)
+
+# --- Database ---
+@app.get("/api/db/pool")
+async def get_pool_metrics():
+    return {**pool_metrics(), "log_sink": log_sink_stats()}
+
 # --- Shutdown ---
 @app.post("/api/shutdown")
 async def shutdown():
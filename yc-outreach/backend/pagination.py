@@ -0,0 +1,93 @@
+import base64
+import json
+from fastapi import HTTPException
+
+# "approx" counts stop after this many rows, so their cost is bounded
+COUNT_CAP = 1000
+
+
+def order_clause(keys: list) -> str:
+    """keys: [(sql_expr, "ASC"|"DESC", result_field), ...] -> ORDER BY body."""
+    return ", ".join(f"{expr} {direction}" for expr, direction, _ in keys)
+
+
+def _signature(keys: list) -> str:
+    return "|".join(f"{field}:{direction}" for _, direction, field in keys)
+
+
+def encode_cursor(keys: list, row: dict) -> str:
+    payload = {"k": _signature(keys), "v": [row[field] for _, _, field in keys]}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: list) -> list:
+    """Values of the last row seen, or None for the first page. 400 on a bad or foreign cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = payload["v"]
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+    if payload.get("k") != _signature(keys) or len(values) != len(keys):
+        raise HTTPException(400, "Cursor does not match this query's sort order")
+    return values
+
+
+def keyset_branches(keys: list, values: list) -> list:
+    """Split "rows after `values`" into disjoint index seeks, deepest first.
+
+    For keys (a DESC, b ASC, id ASC) that is: a = ? AND b = ? AND id > ?,
+    then a = ? AND b > ?, then a < ?. Each branch is a plain range on a
+    prefix of the sort index, which SQLite can seek into; a single
+    OR-of-ANDs condition over mixed ASC/DESC keys would scan instead.
+    """
+    branches = []
+    for i in reversed(range(len(keys))):
+        parts = [f"{keys[j][0]} = ?" for j in range(i)]
+        parts.append(f"{keys[i][0]} {'<' if keys[i][1] == 'DESC' else '>'} ?")
+        branches.append((" AND ".join(parts), values[:i + 1]))
+    return branches
+
+
+def seek_query(build, keys: list, values: list, params: list, limit: int):
+    """Keyset page query. Returns (sql, params).
+
+    build(condition) must return the page query with `condition` ANDed
+    into its WHERE, ordered by `keys` and ending in "LIMIT ?". `params`
+    are the parameters that precede the condition.
+    """
+    parts, all_params = [], []
+    for condition, seek_params in keyset_branches(keys, values):
+        parts.append(f"SELECT * FROM ({build(condition)})")
+        all_params += params + seek_params + [limit]
+    order = ", ".join(f"{field} {direction}" for _, direction, field in keys)
+    return " UNION ALL ".join(parts) + f" ORDER BY {order} LIMIT ?", all_params + [limit]
+
+
+async def count_rows(db, id_sql: str, params: list, mode: str):
+    """Count the rows of `id_sql`. Returns (total, exact).
+
+    mode "exact" counts everything, "approx" stops at COUNT_CAP (the total
+    is then a lower bound), "none" skips counting.
+    """
+    if mode == "none":
+        return None, False
+    if mode == "approx":
+        cursor = await db.execute(f"SELECT COUNT(*) FROM ({id_sql} LIMIT {COUNT_CAP + 1})", params)
+        total = (await cursor.fetchone())[0]
+        if total > COUNT_CAP:
+            return COUNT_CAP, False
+        return total, True
+    cursor = await db.execute(f"SELECT COUNT(*) FROM ({id_sql})", params)
+    return (await cursor.fetchone())[0], True
+
+
+def page_result(rows: list, keys: list, per_page: int):
+    """Trim the look-ahead row fetched in cursor mode and build next_cursor."""
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = encode_cursor(keys, rows[-1]) if has_more and rows else None
+    return rows, next_cursor
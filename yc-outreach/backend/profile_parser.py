@@ -0,0 +1,190 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Worker processes for the founder-name patterns, the slow path of
+# ReconAgent's profile parsing, so they never run on the event loop
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Page text the name patterns may look at
+MAX_PAGE_CHARS = 100000
+MAX_CONTACTS = 5
+
+NEXT_DATA_OPEN = '<script id="__NEXT_DATA__" type="application/json">'
+FOUNDER_PATTERNS = [
+    re.compile(r'(?:Founder|Co-[Ff]ounder|CEO|CTO)[:\s,\-–]+([A-Z][a-z]+ [A-Z][a-z]+)'),
+    re.compile(r'([A-Z][a-z]+ [A-Z][a-z]+)[,\s\-–]+(?:Founder|Co-[Ff]ounder|CEO|CTO)'),
+]
+ROLE_PATTERN = re.compile(r'(CEO|CTO|Founder|Co-[Ff]ounder)')
+
+
+def _contact(name: str, role: str, email: str = "", linkedin_url: str = "") -> dict:
+    return {"name": name, "role": role, "email": email, "linkedin_url": linkedin_url, "source": "yc_profile"}
+
+
+def _text(page) -> str:
+    return page.decode("utf-8", errors="replace") if isinstance(page, bytes) else page
+
+
+def parse_oss(payload) -> list:
+    """Contacts from a yc-oss company JSON document (str or bytes)."""
+    data = json.loads(payload)
+    if not isinstance(data, dict):
+        return []
+    contacts = []
+    # Look for founders field
+    founders = data.get("founders", [])
+    if isinstance(founders, list):
+        for f in founders:
+            if isinstance(f, dict):
+                name = f.get("full_name") or f.get("name") or ""
+                if name:
+                    contacts.append(_contact(
+                        name, f.get("title") or f.get("role") or "Founder",
+                        f.get("email") or "", f.get("linkedin_url") or f.get("linkedin") or "",
+                    ))
+            elif isinstance(f, str) and len(f) > 2:
+                contacts.append(_contact(f, "Founder"))
+    # Also check top-level fields
+    for key in ["founder_names", "team"]:
+        val = data.get(key)
+        if isinstance(val, list):
+            for item in val:
+                if isinstance(item, str) and len(item) > 2:
+                    if not any(c["name"] == item for c in contacts):
+                        contacts.append(_contact(item, "Founder"))
+                elif isinstance(item, dict):
+                    name = item.get("full_name") or item.get("name") or ""
+                    if name and not any(c["name"] == name for c in contacts):
+                        contacts.append(_contact(
+                            name, item.get("title") or item.get("role") or "Team Member",
+                            item.get("email") or "", item.get("linkedin_url") or item.get("linkedin") or "",
+                        ))
+    return contacts[:MAX_CONTACTS]
+
+
+def parse_next_data(html) -> list:
+    """Founders from a YC company page's Next.js __NEXT_DATA__ blob (str or bytes).
+
+    Locates the script with str.find and decodes only its body.
+    """
+    html = _text(html)
+    start = html.find(NEXT_DATA_OPEN)
+    contacts = []
+    if start != -1:
+        body_start = start + len(NEXT_DATA_OPEN)
+        end = html.find("</script>", body_start)
+        if end != -1:
+            try:
+                next_data = json.loads(html[body_start:end])
+                # Navigate the Next.js data structure to find founders
+                props = next_data.get("props", {}).get("pageProps", {})
+                company_data = props.get("company", props)
+                for f in company_data.get("founders", []):
+                    if isinstance(f, dict):
+                        name = f.get("full_name") or f.get("name") or ""
+                        if name and not any(c["name"] == name for c in contacts):
+                            contacts.append(_contact(name, f.get("title") or "Founder", "", f.get("linkedin_url") or ""))
+            except (ValueError, AttributeError):
+                pass
+    return contacts[:MAX_CONTACTS]
+
+
+def parse_patterns(html) -> list:
+    """Founders matched by the name patterns (str or bytes).
+
+    Only the text before the __NEXT_DATA__ script tag is searched, which
+    is where the rendered page is.
+    """
+    html = _text(html)
+    start = html.find(NEXT_DATA_OPEN)
+    text = html[:min(start, MAX_PAGE_CHARS) if start != -1 else MAX_PAGE_CHARS]
+    contacts = []
+    seen = set()
+    for pat in FOUNDER_PATTERNS:
+        for m in pat.finditer(text):
+            name = m.group(1).strip()
+            if name not in seen and len(name) > 3 and len(name) < 40:
+                seen.add(name)
+                role_m = ROLE_PATTERN.search(m.group(0))
+                contacts.append(_contact(name, role_m.group(1) if role_m else "Founder"))
+    return contacts[:MAX_CONTACTS]
+
+
+def parse(html) -> list:
+    """Contacts from a YC company page (str or bytes): the __NEXT_DATA__
+    founders, or the name patterns when it lists none."""
+    html = _text(html)
+    return parse_next_data(html) or parse_patterns(html)
+
+
+async def parse_page(html) -> list:
+    """parse(html), sending only the pattern fallback to the worker pool.
+
+    The __NEXT_DATA__ path is one str.find and a json.loads of the blob,
+    cheaper inline than a round trip to a worker.
+    """
+    html = _text(html)
+    return parse_next_data(html) or await run_parser(parse_patterns, html)
+
+
+_pool = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, not fork: forking this process (event loop, aiosqlite and
+        # executor threads) can hand the child a lock held by another thread
+        _pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def run_parser(func, payload) -> list:
+    """func(payload) in the worker pool."""
+    return await asyncio.get_running_loop().run_in_executor(_get_pool(), func, payload)
+
+
+def close_parser_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _bench_page(i: int, filler_chars: int, founders: bool) -> bytes:
+    # With `founders` off, the names are only in the rendered text and parse() falls back to the patterns
+    names = [("Ann Hale", "CEO"), ("Bob Stone", "CTO")]
+    filler = f"<div class='prose'>Company {i} builds tools for teams. </div>\n" * (filler_chars // 60)
+    people = "".join(f"<div>{name}, {role}</div>" for name, role in names)
+    data = {"props": {"pageProps": {"company": {
+        "founders": [{"full_name": name, "title": role} for name, role in names] if founders else [],
+    }}}}
+    return f"<html><body>{people}{filler}{NEXT_DATA_OPEN}{json.dumps(data)}</script></body></html>".encode()
+
+
+async def _bench(pages: int, filler_chars: int):
+    for founders, label in ((True, "__NEXT_DATA__"), (False, "name patterns")):
+        docs = [_bench_page(i, filler_chars, founders) for i in range(pages)]
+        start = time.perf_counter()
+        found = sum(len(parse(d)) for d in docs)
+        inline = pages / (time.perf_counter() - start)
+
+        await run_parser(parse, docs[0])  # start the workers
+        start = time.perf_counter()
+        results = await asyncio.gather(*(parse_page(d) for d in docs))
+        pooled = pages / (time.perf_counter() - start)
+        assert found == sum(map(len, results)) == 2 * pages
+        print(f"{label}: {pages} pages of ~{filler_chars // 1000}KB, {inline:.0f} pages/s inline, "
+              f"{pooled:.0f} pages/s via parse_page with {PARSE_WORKERS} workers")
+    close_parser_pool()
+
+
+if __name__ == "__main__":
+    # python profile_parser.py [pages] [page_kb]
+    asyncio.run(_bench(int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+                       int(sys.argv[2]) * 1000 if len(sys.argv) > 2 else 100000))
@@ -0,0 +1,175 @@
+import asyncio
+import heapq
+import time
+import httpx
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+from database import db_read, db_write
+
+# (requests per second, burst) per host for recon lookups. The GitHub
+# rate matches the 1.5s spacing the agent used to sleep between calls.
+RECON_HOST_RATES = {
+    "www.ycombinator.com": (1.0, 2),
+    "yc-oss.github.io": (5.0, 5),
+    "api.github.com": (1 / 1.5, 1),
+}
+DEFAULT_HOST_RATE = (2.0, 2)
+
+# Unauthenticated GitHub limits, (requests, window seconds), until the
+# X-RateLimit-* headers say otherwise; and how many to leave unspent
+GITHUB_LIMITS = {"core": (60, 3600), "search": (10, 60)}
+GITHUB_RESERVE = {"core": 10, "search": 1}
+
+
+class BudgetExhausted(Exception):
+    """Raised instead of making a request the budget can't cover."""
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`. acquire() waits for one."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.acquired = 0
+        self.waited = 0.0
+
+    async def acquire(self):
+        # The lock queues waiters in arrival order, so each one sleeps
+        # only for its own token
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                self.waited += delay
+                self._tokens = 1.0
+                self._updated = time.monotonic()
+            self._tokens -= 1
+            self.acquired += 1
+
+
+class HostRateLimiter:
+    """One token bucket per host, shared by every task making requests through it."""
+
+    def __init__(self, rates: dict = None, default: tuple = DEFAULT_HOST_RATE):
+        self.rates = RECON_HOST_RATES if rates is None else rates
+        self.default = default
+        self._buckets = {}
+
+    def bucket(self, host: str) -> TokenBucket:
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(*self.rates.get(host, self.default))
+        return self._buckets[host]
+
+    async def acquire(self, url: str):
+        await self.bucket(urlparse(url).netloc).acquire()
+
+    async def get(self, client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+        await self.acquire(url)
+        return await client.get(url, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            host: {"requests": b.acquired, "waited_s": round(b.waited, 1)}
+            for host, b in self._buckets.items()
+        }
+
+
+class GitHubBudget:
+    """GitHub rate-limit budget, stored in api_budgets so runs and processes share it.
+
+    reserve() takes one request from the budget (refilling it once the
+    reset time has passed) and record() overwrites it with what GitHub
+    reports in the X-RateLimit-* headers, so estimates never drift far.
+    turn() hands out the right to ask in priority order.
+    """
+
+    def __init__(self):
+        self._waiters = []  # heap of (-priority, seq, future)
+        self._seq = 0
+        self._busy = False
+
+    @staticmethod
+    def resource(url: str) -> str:
+        return "search" if urlparse(url).path.startswith("/search") else "core"
+
+    @asynccontextmanager
+    async def turn(self, priority: float = 0):
+        """Exclusive section; when several tasks wait, the highest priority goes next."""
+        if self._busy:
+            fut = asyncio.get_running_loop().create_future()
+            self._seq += 1
+            heapq.heappush(self._waiters, (-priority, self._seq, fut))
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    self._release()  # we were handed the turn; pass it on
+                raise
+        else:
+            self._busy = True
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._busy = False
+
+    async def reserve(self, resource: str) -> bool:
+        limit, window = GITHUB_LIMITS[resource]
+        now = int(time.time())
+        name = f"github:{resource}"
+        async with db_write() as db:
+            await db.execute(
+                "INSERT INTO api_budgets (name, budget_limit, remaining, reset_at) VALUES (?, ?, ?, 0) "
+                "ON CONFLICT(name) DO NOTHING",
+                (name, limit, limit),
+            )
+            # One statement, so concurrent processes can't both take the last request
+            cursor = await db.execute("""
+                UPDATE api_budgets SET
+                    remaining = CASE WHEN reset_at <= :now THEN budget_limit ELSE remaining END - 1,
+                    reset_at = CASE WHEN reset_at <= :now THEN :now + :window ELSE reset_at END,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE name = :name AND (reset_at <= :now OR remaining > :reserve)
+            """, {"now": now, "window": window, "name": name, "reserve": GITHUB_RESERVE[resource]})
+            return cursor.rowcount == 1
+
+    async def record(self, resource: str, resp: httpx.Response):
+        headers = resp.headers
+        resource = headers.get("x-ratelimit-resource", resource)
+        if resource not in GITHUB_LIMITS:
+            return
+        remaining, reset_at = headers.get("x-ratelimit-remaining"), headers.get("x-ratelimit-reset")
+        limit = headers.get("x-ratelimit-limit")
+        if resp.status_code in (403, 429) and headers.get("retry-after"):
+            # Secondary rate limit: nothing until the server says so
+            remaining, reset_at = 0, int(time.time()) + int(headers["retry-after"])
+        if remaining is None or reset_at is None:
+            return
+        async with db_write() as db:
+            await db.execute("""
+                UPDATE api_budgets SET remaining = ?, reset_at = ?, budget_limit = COALESCE(?, budget_limit),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE name = ?
+            """, (int(remaining), int(reset_at), int(limit) if limit else None, f"github:{resource}"))
+
+    async def snapshot(self) -> dict:
+        async with db_read() as db:
+            cursor = await db.execute("SELECT name, budget_limit, remaining, reset_at FROM api_budgets WHERE name LIKE 'github:%'")
+            return {
+                r["name"].split(":", 1)[1]: {"remaining": r["remaining"], "limit": r["budget_limit"], "reset_at": r["reset_at"]}
+                for r in await cursor.fetchall()
+            }
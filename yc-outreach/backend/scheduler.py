@@ -0,0 +1,160 @@
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+
+# The scheduler is off unless AGENT_SCHEDULE is set: "agent=cron;agent=cron", each
+# cron being minute hour day-of-month month day-of-week in local time, e.g.
+# AGENT_SCHEDULE="scout=0 6 * * *;recon=30 6 * * *;tracker=0 * * * *"
+# Each run starts up to this many seconds after its slot, so processes and agents don't fire in lockstep
+SCHEDULE_JITTER = float(os.environ.get("SCHEDULE_JITTER", "120"))
+
+CRON_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]  # day of week 0 and 7 are Sunday
+
+
+def _cron_field(field: str, low: int, high: int) -> set:
+    values = set()
+    for part in field.split(","):
+        spec, _, step = part.partition("/")
+        if spec == "*":
+            start, end = low, high
+        elif "-" in spec:
+            start, end = (int(v) for v in spec.split("-", 1))
+        else:
+            start = end = int(spec)
+            if step:
+                end = high
+        step = int(step) if step else 1
+        if step < 1 or start < low or end > high or start > end:
+            raise ValueError(f"Bad cron field: {field!r}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class Cron:
+    """A five-field cron expression. As in cron, when both day fields are
+    restricted a day matching either one counts."""
+
+    def __init__(self, expr: str):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expr!r}")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _cron_field(f, *r) for f, r in zip(fields, CRON_RANGES)
+        )
+        self.weekdays = {d % 7 for d in self.weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _day_matches(self, t: datetime) -> bool:
+        in_days = t.day in self.days
+        in_weekdays = (t.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, after: datetime) -> datetime:
+        t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(t):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+            elif t.hour not in self.hours:
+                t = (t + timedelta(hours=1)).replace(minute=0)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"Cron expression never fires: {self.expr!r}")
+
+
+def parse_schedule(spec: str, agents=None) -> dict:
+    """"agent=cron;agent=cron" -> {agent: Cron}. ValueError on an agent not in `agents`, if given."""
+    schedule = {}
+    for entry in spec.split(";"):
+        if entry.strip():
+            name, _, expr = entry.partition("=")
+            name = name.strip()
+            if agents is not None and name not in agents:
+                raise ValueError(f"Unknown agent in schedule: {name!r} (expected one of {', '.join(agents)})")
+            schedule[name] = Cron(expr.strip())
+    return schedule
+
+
+class Scheduler:
+    """Submits agent runs on their cron schedules.
+
+    Runs go through `submit(name)`, i.e. the job runner and its run locks,
+    so a slot that comes up while the agent is already running (here or in
+    another process) joins that run rather than starting a second one.
+    """
+
+    def __init__(self, submit, schedule: dict):
+        self.submit = submit
+        self.schedule = schedule
+        self.next_runs = {}
+        self._task = None
+
+    def start(self):
+        if self.schedule and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        now = datetime.now()
+        for name, cron in self.schedule.items():
+            self.next_runs[name] = cron.next_after(now) + timedelta(seconds=random.uniform(0, SCHEDULE_JITTER))
+        while True:
+            name = min(self.next_runs, key=self.next_runs.get)
+            delay = (self.next_runs[name] - datetime.now()).total_seconds()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue  # woke early or the clock moved: look again
+            try:
+                job = await self.submit(name)
+                print(f"[scheduler] {name}: {'joined' if job.get('attached') else 'started'} job {job['id']}")
+            except Exception as e:
+                print(f"[scheduler] {name} run failed to start: {e}")
+            self.next_runs[name] = (self.schedule[name].next_after(datetime.now())
+                                    + timedelta(seconds=random.uniform(0, SCHEDULE_JITTER)))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> list:
+        return [{"agent": name, "cron": cron.expr, "next_run": self.next_runs.get(name)}
+                for name, cron in self.schedule.items()]
+
+
+def load_schedule(agents=None) -> dict:
+    """The AGENT_SCHEDULE schedule; empty (no scheduled runs) when it is unset."""
+    return parse_schedule(os.environ.get("AGENT_SCHEDULE", ""), agents)
+
+
+_scheduler: Scheduler = None
+
+
+def start_scheduler(submit, agents):
+    """Schedule `submit(name)` per AGENT_SCHEDULE; names must be in `agents`."""
+    global _scheduler
+    _scheduler = Scheduler(submit, load_schedule(agents))
+    _scheduler.start()
+
+
+async def stop_scheduler():
+    global _scheduler
+    if _scheduler is not None:
+        await _scheduler.stop()
+        _scheduler = None
+
+
+def schedule_status() -> list:
+    return _scheduler.status() if _scheduler is not None else []
@@ -0,0 +1,275 @@
+import json
+import time
+from database import db_read, db_write, AI_FACETS, location_list
+
+# Substrings looked for in the lowercased facets + one-liner + description
+KEYWORD_GROUPS = {
+    "ai": ["artificial intelligence", "machine learning", "deep learning", "nlp",
+           "natural language", "llm", "large language model", "computer vision",
+           "neural network", "generative ai", " ai ", " ai,", " ml ",
+           "ai-", "ml-", "ai/ml"],
+    "infra": ["developer tools", "devtools", "infrastructure", "saas", "platform",
+              "api", "sdk", "cloud", "dev tool"],
+}
+# Looked for in the lowercased, " | "-joined locations
+LOCATION_GROUPS = {
+    "nyc": ["nyc", "new york"],
+    "remote": ["remote"],
+}
+
+# One bit per feature, in bit order. Location and team-size features are
+# exclusive classes, so a profile's weights simply add up.
+FEATURES = [
+    "ai",                    # AI facet, or an "ai" keyword group hit
+    "infra",                 # "infra" keyword group hit
+    "hiring",
+    "location_nyc",
+    "location_remote_only",  # remote, and no NYC location
+    "team_under_2",          # includes unknown team size
+    "team_2_50",
+    "team_over_50",
+]
+FEATURE_BITS = {name: 1 << i for i, name in enumerate(FEATURES)}
+
+# The weights ScoutAgent has always used
+DEFAULT_WEIGHTS = {"ai": 30, "hiring": 20, "location_nyc": 15, "location_remote_only": 15, "team_2_50": 10, "infra": 5}
+
+AI_FACET_SET = {f.lower() for f in AI_FACETS}
+
+# Companies read, scored and written back per transaction
+SCORE_CHUNK = 2000
+# What company_features() reads
+FEATURE_COLUMNS = "industries, tags, locations, is_hiring, team_size, one_liner, long_description"
+
+
+class KeywordMatcher:
+    """Keyword groups compiled once into lowercased, de-duplicated tuples.
+
+    groups(text) is `keyword in text` per keyword, stopping at the first
+    hit in each group. On CPython that substring search beats one combined
+    regex over the same keywords about 4x, since re tries the alternation
+    at nearly every position of a long description.
+    """
+
+    def __init__(self, groups: dict):
+        self._groups = tuple(
+            (name, tuple(sorted({k.lower() for k in keywords}, key=len)))
+            for name, keywords in groups.items()
+        )
+
+    def groups(self, text: str) -> set:
+        """Names of the groups with at least one keyword in `text`."""
+        found = set()
+        for name, keywords in self._groups:
+            for keyword in keywords:
+                if keyword in text:
+                    found.add(name)
+                    break
+        return found
+
+
+TEXT_MATCHER = KeywordMatcher(KEYWORD_GROUPS)
+LOCATION_MATCHER = KeywordMatcher(LOCATION_GROUPS)
+
+
+def _json_list(value) -> list:
+    """Parse one of the JSON list columns on companies, tolerating bad data."""
+    try:
+        items = json.loads(value) if value else []
+    except (TypeError, ValueError):
+        return []
+    return [str(i) for i in items if i] if isinstance(items, list) else []
+
+
+def company_features(c: dict) -> int:
+    """The company's FEATURES bitmask; the only part of scoring that reads text."""
+    facets = _json_list(c.get("industries")) + _json_list(c.get("tags"))
+    text = " ".join(facets + [
+        c.get("one_liner") or "",
+        c.get("long_description") or "",
+    ]).lower()
+    hits = TEXT_MATCHER.groups(text)
+    try:
+        locations = location_list(json.loads(c.get("locations") or "[]"))
+    except (TypeError, ValueError):
+        locations = []
+    places = LOCATION_MATCHER.groups(" | ".join(str(loc) for loc in locations).lower())
+
+    features = 0
+    if "ai" in hits or AI_FACET_SET.intersection(f.lower() for f in facets):
+        features |= FEATURE_BITS["ai"]
+    if "infra" in hits:
+        features |= FEATURE_BITS["infra"]
+    if c.get("is_hiring"):
+        features |= FEATURE_BITS["hiring"]
+    if "nyc" in places:
+        features |= FEATURE_BITS["location_nyc"]
+    elif "remote" in places:
+        features |= FEATURE_BITS["location_remote_only"]
+    ts = c.get("team_size") or 0
+    if ts < 2:
+        features |= FEATURE_BITS["team_under_2"]
+    elif ts <= 50:
+        features |= FEATURE_BITS["team_2_50"]
+    else:
+        features |= FEATURE_BITS["team_over_50"]
+    return features
+
+
+def check_weights(weights: dict) -> dict:
+    """Validated {feature: int weight}; ValueError on unknown features or non-integer weights."""
+    unknown = set(weights) - set(FEATURES)
+    if unknown:
+        raise ValueError(f"Unknown features: {', '.join(sorted(unknown))}")
+    try:
+        return {name: int(weights[name]) for name in FEATURES if weights.get(name)}
+    except (TypeError, ValueError):
+        raise ValueError("Weights must be integers")
+
+
+def score_features(features: int, weights: dict = None) -> int:
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    return sum(w for name, w in weights.items() if features & FEATURE_BITS[name])
+
+
+def score_company(c: dict, weights: dict = None) -> int:
+    return score_features(company_features(c), weights)
+
+
+def score_sql(weights: dict) -> str:
+    """SQL expression over companies.features equal to score_features(features, weights).
+
+    Weights are inlined; they must come from check_weights.
+    """
+    terms = [f"((features >> {FEATURES.index(name)}) & 1) * {int(w)}" for name, w in weights.items() if w]
+    return " + ".join(terms) if terms else "0"
+
+
+async def get_weights(db) -> dict:
+    cursor = await db.execute("SELECT weights FROM scoring_profiles WHERE name = 'active'")
+    row = await cursor.fetchone()
+    return json.loads(row["weights"]) if row else dict(DEFAULT_WEIGHTS)
+
+
+async def apply_weights(db, weights: dict) -> int:
+    """Recompute relevance_score for the whole table from the stored features. Returns rows changed."""
+    expr = score_sql(weights)
+    cursor = await db.execute(
+        f"UPDATE companies SET relevance_score = {expr} WHERE features IS NOT NULL AND relevance_score IS NOT ({expr})"
+    )
+    return cursor.rowcount
+
+
+async def set_weights(weights: dict) -> dict:
+    """Store `weights` as the active profile and re-rank every company with it."""
+    weights = check_weights(weights)
+    await compute_features()
+    start = time.perf_counter()
+    async with db_write() as db:
+        await db.execute(
+            "INSERT OR REPLACE INTO scoring_profiles (name, weights, updated_at) VALUES ('active', ?, CURRENT_TIMESTAMP)",
+            (json.dumps(weights),),
+        )
+        changed = await apply_weights(db, weights)
+    return {"weights": weights, "changed": changed, "seconds": round(time.perf_counter() - start, 3)}
+
+
+async def preview_weights(weights: dict, limit: int = 20) -> list:
+    """Top `limit` companies under `weights`, without writing anything."""
+    expr = score_sql(check_weights(weights))
+    async with db_read() as db:
+        cursor = await db.execute(f"""
+            SELECT id, name, slug, batch, one_liner, is_hiring, team_size, features,
+                   relevance_score AS current_score, {expr} AS score
+            FROM companies WHERE features IS NOT NULL
+            ORDER BY score DESC, is_hiring DESC, name ASC, id ASC
+            LIMIT ?
+        """, (limit,))
+        rows = [dict(r) for r in await cursor.fetchall()]
+    for r in rows:
+        r["features"] = [name for name in FEATURES if r["features"] & FEATURE_BITS[name]]
+    return rows
+
+
+async def compute_features(full: bool = False, chunk_size: int = SCORE_CHUNK) -> dict:
+    """Fill companies.features, a chunk at a time.
+
+    Only rows without features (new, or changed by a scrape) unless
+    `full`, which is needed after the keyword groups change. Each chunk is
+    read by id range and written back with one executemany; unchanged
+    bitmasks are not written.
+    """
+    start = time.perf_counter()
+    scanned = changed = 0
+    last_id = 0
+    scope = "" if full else "AND features IS NULL"
+    while True:
+        async with db_read() as db:
+            cursor = await db.execute(f"""
+                SELECT id, {FEATURE_COLUMNS}, features
+                FROM companies WHERE id > ? {scope} ORDER BY id LIMIT ?
+            """, (last_id, chunk_size))
+            rows = await cursor.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        updates = []
+        for r in rows:
+            features = company_features(dict(r))
+            if features != r["features"]:
+                updates.append((features, r["id"]))
+        if updates:
+            async with db_write() as db:
+                await db.executemany("UPDATE companies SET features = ? WHERE id = ?", updates)
+        scanned += len(rows)
+        changed += len(updates)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "scanned": scanned,
+        "changed": changed,
+        "seconds": round(elapsed, 2),
+        "per_second": round(scanned / elapsed) if elapsed else scanned,
+    }
+
+
+async def score_companies(ids: list) -> dict:
+    """Features and relevance_score for just these companies, under the active profile.
+
+    For scoring a scrape as it is written; rescore_companies() still
+    re-ranks the whole table afterwards. Returns {id: score}.
+    """
+    scores, updates = {}, []
+    async with db_read() as db:
+        weights = await get_weights(db)
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            cursor = await db.execute(
+                f"SELECT id, {FEATURE_COLUMNS} FROM companies WHERE id IN ({','.join('?' * len(part))})", part
+            )
+            for r in await cursor.fetchall():
+                features = company_features(dict(r))
+                scores[r["id"]] = score_features(features, weights)
+                updates.append((features, scores[r["id"]], r["id"]))
+    if updates:
+        async with db_write() as db:
+            await db.executemany("UPDATE companies SET features = ?, relevance_score = ? WHERE id = ?", updates)
+    return scores
+
+
+async def rescore_companies(full: bool = False) -> dict:
+    """Bring features up to date, then re-rank every company with the active profile."""
+    start = time.perf_counter()
+    computed = await compute_features(full)
+    async with db_write() as db:
+        changed = await apply_weights(db, await get_weights(db))
+        cursor = await db.execute("SELECT COUNT(*) FROM companies WHERE features IS NOT NULL")
+        scored = (await cursor.fetchone())[0]
+    elapsed = time.perf_counter() - start
+    return {
+        "scored": scored,
+        "changed": changed,
+        "features_computed": computed["scanned"],
+        "seconds": round(elapsed, 2),
+        "per_second": round(scored / elapsed) if elapsed else scored,
+    }
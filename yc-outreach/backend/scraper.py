@@ -1,43 +1,131 @@
 import httpx
 import json
 import asyncio
-from database import get_db
+import hashlib
+from functools import partial
+from contextlib import asynccontextmanager
+from datetime import datetime
+from urllib.parse import urlparse
+from database import db_read, db_write, optimize_search_index, sync_company_facets, refresh_ai_count, location_list
+from http_cache import HttpCache, conditional_get, get_cache
+from jobs import report_progress
 
 YC_API = "https://api.ycombinator.com/v0.1/companies"
 YC_OSS_API = "https://yc-oss.github.io/api/batches/{batch}.json"
-BATCHES = ["W23", "S23", "W24", "S24", "W25"]
 
-async def fetch_yc_api(client: httpx.AsyncClient, batch: str) -> list[dict]:
-    companies = []
+# Columns written by the scraper, in hash and INSERT order; slug first
+COMPANY_FIELDS = ["slug", "name", "website", "one_liner", "long_description", "team_size", "batch", "status",
+                  "industries", "tags", "locations", "is_hiring", "logo_url", "yc_url"]
+
+# Requests in flight across the whole scrape, and per host
+SCRAPE_CONCURRENCY = 16
+SCRAPE_PER_HOST = 6
+# YC API pages requested ahead of the one being consumed
+YC_PREFETCH_PAGES = 3
+# Batches fetched ahead of the one being merged, and companies per DB write
+SCRAPE_BATCH_WINDOW = 8
+SCRAPE_WRITE_CHUNK = 500
+
+def yc_batches(first_year: int = 5, last_year: int = None) -> list[str]:
+    """Every YC batch code from W{first_year} on. YC runs four batches a year from 2025."""
+    last_year = last_year if last_year is not None else datetime.now().year % 100
+    batches = []
+    for year in range(first_year, last_year + 1):
+        seasons = ["W", "X", "S", "F"] if year >= 25 else ["W", "S"]
+        batches.extend(f"{s}{year:02d}" for s in seasons)
+    return batches
+
+BATCHES = yc_batches()
+
+class RequestLimiter:
+    """Caps requests in flight, globally and per host, for everything sharing it."""
+
+    def __init__(self, total: int = SCRAPE_CONCURRENCY, per_host: int = SCRAPE_PER_HOST):
+        self._total = asyncio.Semaphore(total)
+        self._per_host = per_host
+        self._hosts = {}
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        host = urlparse(url).netloc
+        host_sem = self._hosts.setdefault(host, asyncio.Semaphore(self._per_host))
+        async with self._total, host_sem:
+            yield
+
+    async def get(self, client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+        async with self.slot(url):
+            return await client.get(url, **kwargs)
+
+def scrape_cache() -> HttpCache:
+    return get_cache("scraper")
+
+async def _fetch_yc_page(client, limiter, cache, batch: str, page: int):
+    resp = await conditional_get(client, cache, YC_API, params={"batch": batch, "page": page},
+                                 get=partial(limiter.get, client), timeout=30)
+    resp.raise_for_status()
+    data = resp.json()
+    return data if isinstance(data, list) else data.get("companies", data.get("results", [])), resp
+
+async def fetch_yc_api(client: httpx.AsyncClient, batch: str, limiter: RequestLimiter = None,
+                       prefetch: int = YC_PREFETCH_PAGES, cache: HttpCache = None):
+    """Walk the YC API pages for a batch until an empty page.
+
+    Keeps `prefetch` pages in flight ahead of the one being consumed, so a
+    batch costs about pages / prefetch round-trips instead of one per page.
+    Pages past the first empty or failed one are cancelled and discarded.
+
+    Returns (companies, responses); a failed page shows up as None in
+    responses.
+    """
+    limiter = limiter or RequestLimiter()
+    cache = cache or scrape_cache()
+    companies, responses = [], []
+    window = {}
+    next_page = 0
     page = 0
-    while True:
-        try:
-            resp = await client.get(YC_API, params={"batch": batch, "page": page}, timeout=30)
-            resp.raise_for_status()
-            data = resp.json()
-            items = data if isinstance(data, list) else data.get("companies", data.get("results", []))
+    try:
+        while True:
+            while len(window) < max(1, prefetch):
+                window[next_page] = asyncio.create_task(_fetch_yc_page(client, limiter, cache, batch, next_page))
+                next_page += 1
+            try:
+                items, resp = await window.pop(page)
+            except Exception as e:
+                print(f"[scraper] YC API error batch={batch} page={page}: {e}")
+                responses.append(None)
+                break
+            responses.append(resp)
             if not items:
                 break
             companies.extend(items)
             page += 1
-        except Exception as e:
-            print(f"[scraper] YC API error batch={batch} page={page}: {e}")
-            break
+    finally:
+        for task in window.values():
+            task.cancel()
+        await asyncio.gather(*window.values(), return_exceptions=True)
     print(f"[scraper] YC API: {batch} → {len(companies)} companies")
-    return companies
+    return companies, responses
 
-async def fetch_oss_api(client: httpx.AsyncClient, batch: str) -> list[dict]:
+async def fetch_oss_api(client: httpx.AsyncClient, batch: str, limiter: RequestLimiter = None,
+                        cache: HttpCache = None):
+    """Returns (companies, responses), like fetch_yc_api."""
     url = YC_OSS_API.format(batch=batch.lower())
+    limiter = limiter or RequestLimiter()
+    cache = cache or scrape_cache()
     try:
-        resp = await client.get(url, timeout=30)
+        resp = await conditional_get(client, cache, url, get=partial(limiter.get, client), timeout=30)
+        if resp.status_code == 404:
+            # Batch not published on yc-oss; a stable answer, not a failure
+            print(f"[scraper] OSS API: {batch} not found")
+            return [], []
         resp.raise_for_status()
         data = resp.json()
         items = data if isinstance(data, list) else data.get("companies", [])
         print(f"[scraper] OSS API: {batch} → {len(items)} companies")
-        return items
+        return items, [resp]
     except Exception as e:
         print(f"[scraper] OSS API error batch={batch}: {e}")
-        return []
+        return [], [None]
 
 def normalize_yc(c: dict, batch: str) -> dict:
     badges = c.get("badges", [])
@@ -59,7 +147,7 @@ def normalize_yc(c: dict, batch: str) -> dict:
         "status": c.get("status", ""),
         "industries": json.dumps(c.get("industries", [])),
         "tags": json.dumps(c.get("tags", [])),
-        "locations": json.dumps(c.get("locations", c.get("regions", []))),
+        "locations": json.dumps(location_list(c.get("locations", c.get("regions", [])))),
         "is_hiring": 1 if is_hiring else 0,
         "logo_url": c.get("smallLogoUrl", ""),
         "yc_url": c.get("url", f"https://www.ycombinator.com/companies/{c.get('slug', '')}"),
@@ -77,52 +165,212 @@ def normalize_oss(c: dict, batch: str) -> dict:
         "status": c.get("status", ""),
         "industries": json.dumps(c.get("industries", [])),
         "tags": json.dumps(c.get("tags", [])),
-        "locations": json.dumps(c.get("all_locations", c.get("regions", []))),
+        "locations": json.dumps(location_list(c.get("all_locations", c.get("regions", [])))),
         "is_hiring": 1 if c.get("isHiring") else 0,
         "logo_url": c.get("small_logo_thumb_url", ""),
         "yc_url": c.get("url", f"https://www.ycombinator.com/companies/{c.get('slug', '')}"),
     }
 
-async def scrape_all():
+def merge_batch(batch: str, yc_companies: list[dict], oss_companies: list[dict]) -> dict:
+    """Normalize one batch's two sources into {slug: company}; YC API fields win."""
     merged = {}
-    async with httpx.AsyncClient() as client:
-        for batch in BATCHES:
-            yc_companies, oss_companies = await asyncio.gather(
-                fetch_yc_api(client, batch),
-                fetch_oss_api(client, batch)
+    for c in oss_companies:
+        slug = c.get("slug", "")
+        if slug:
+            merged[slug] = normalize_oss(c, batch)
+    for c in yc_companies:
+        slug = c.get("slug", "")
+        if slug:
+            existing = merged.get(slug, {})
+            normalized = normalize_yc(c, batch)
+            # YC API overwrites but keep longer descriptions
+            if existing.get("long_description") and not normalized["long_description"]:
+                normalized["long_description"] = existing["long_description"]
+            if existing.get("logo_url") and not normalized["logo_url"]:
+                normalized["logo_url"] = existing["logo_url"]
+            merged[slug] = normalized
+    return {slug: c for slug, c in merged.items() if c["name"] and c["slug"]}
+
+async def iter_batches(client: httpx.AsyncClient, batches: list[str], limiter: RequestLimiter,
+                       cache: HttpCache, window: int = SCRAPE_BATCH_WINDOW):
+    """Yield (batch, (yc, yc_responses), (oss, oss_responses)) in batch order.
+
+    At most `window` batches are fetched ahead of the consumer, so raw
+    payloads held at once are bounded by the window, not the batch list.
+    """
+    pending = {}
+    batches = list(batches)
+    ahead = 0
+    try:
+        for i, batch in enumerate(batches):
+            while ahead < len(batches) and ahead < i + max(1, window):
+                b = batches[ahead]
+                pending[ahead] = asyncio.gather(
+                    fetch_yc_api(client, b, limiter, cache=cache), fetch_oss_api(client, b, limiter, cache=cache)
+                )
+                ahead += 1
+            yc, oss = await pending.pop(i)
+            yield batch, yc, oss
+    finally:
+        for task in pending.values():
+            task.cancel()
+        await asyncio.gather(*pending.values(), return_exceptions=True)
+
+async def scrape_all(batches: list[str] = None, concurrency: int = SCRAPE_CONCURRENCY,
+                     per_host: int = SCRAPE_PER_HOST, chunk_size: int = SCRAPE_WRITE_CHUNK, on_written=None):
+    """Fetch → normalize → merge → write, one batch at a time.
+
+    Normalized companies are written in chunks of `chunk_size` as they are
+    produced; across the run only slug → content hash is kept, for
+    de-duplication and for finding removed companies at the end.
+    `on_written(ids)`, if given, is awaited with the ids each chunk
+    inserted or changed.
+    """
+    batches = batches or BATCHES
+    limiter = RequestLimiter(concurrency, per_host)
+    cache = scrape_cache()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with db_read() as db:
+        cursor = await db.execute("SELECT batch, COUNT(*) AS n FROM companies GROUP BY batch")
+        stored_counts = {r["batch"]: r["n"] for r in await cursor.fetchall()}
+
+    seen = {}        # slug -> content hash of the version written this run
+    chunk = {}       # slug -> normalized company, waiting to be written
+    fetched, skipped, applied = set(), set(), []
+    totals = {"inserted": 0, "updated": 0, "unchanged": 0}
+
+    async def flush():
+        counts = await write_companies(list(chunk.values()))
+        for key in totals:
+            totals[key] += counts[key]
+        chunk.clear()
+        if on_written and counts["changed_ids"]:
+            await on_written(counts["changed_ids"])
+
+    async with httpx.AsyncClient(limits=limits) as client:
+        done = 0
+        async for batch, (yc_companies, yc_resps), (oss_companies, oss_resps) in iter_batches(
+            client, batches, limiter, cache
+        ):
+            done += 1
+            await report_progress(batches_done=done, batches_total=len(batches))
+            responses = yc_resps + oss_resps
+            applied.extend((r.key, r.digest) for r in responses if r is not None)
+            # A batch whose every payload is byte-identical to the one last
+            # applied (304, or same digest) is skipped outright: no
+            # normalizing, hashing or diffing. Only if it is actually in the
+            # DB, so a wiped DB still refills.
+            if (responses and all(r is not None and not r.changed for r in responses)
+                    and (stored_counts.get(batch) or not (yc_companies or oss_companies))):
+                skipped.add(batch)
+                continue
+            # Only a batch whose every page came back is complete enough to
+            # read missing companies as removed. Empty batches (API down,
+            # typo'd batch) and batches with a failed page are left alone.
+            if (yc_companies or oss_companies) and all(r is not None for r in responses):
+                fetched.add(batch)
+            # Later batches win, as they did when fetched sequentially
+            for slug, company in merge_batch(batch, yc_companies, oss_companies).items():
+                digest = company_hash(company)
+                if seen.get(slug) == digest:
+                    continue
+                seen[slug] = digest
+                chunk[slug] = company
+                if len(chunk) >= chunk_size:
+                    await flush()
+    if chunk:
+        await flush()
+
+    removed = await remove_missing(seen, fetched)
+    if totals["inserted"] or totals["updated"] or removed:
+        async with db_write() as db:
+            await refresh_ai_count(db)
+            # Triggers keep companies_fts in step row by row; compact it after the bulk load
+            await optimize_search_index(db)
+
+    kept = sum(stored_counts.get(batch, 0) for batch in skipped)
+    result = {
+        "total": len(seen) + kept,
+        "inserted": totals["inserted"],
+        "updated": totals["updated"],
+        "unchanged": totals["unchanged"] + kept,
+        "removed": removed,
+    }
+    print(f"[scraper] Total unique companies: {result['total']} (skipped {len(skipped)} unchanged batches)")
+
+    # Only now is every payload reflected in the DB
+    for key, digest in applied:
+        cache.mark_applied(key, digest)
+    cache.flush()
+    result["skipped_batches"] = len(skipped)
+    result["http_cache"] = cache.stats()
+    print(f"[scraper] Upsert: {result}")
+    return result
+
+def company_hash(c: dict) -> str:
+    """Stable digest of a normalized company's stored fields."""
+    payload = json.dumps([c[f] for f in COMPANY_FIELDS], separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+async def write_companies(companies: list[dict]) -> dict:
+    """Insert or update one chunk of companies, matched by slug, in one transaction.
+
+    Rows are matched by slug, so ids (and the contacts and outreach hanging
+    off them) survive a rescrape. Rows whose content hash is unchanged are
+    not touched.
+    """
+    columns = ", ".join(COMPANY_FIELDS)
+    inserts, updates, unchanged = [], [], 0
+    changed_ids = []
+    async with db_write() as db:
+        stored = {}
+        slugs = [c["slug"] for c in companies]
+        for i in range(0, len(slugs), 500):
+            part = slugs[i:i + 500]
+            cursor = await db.execute(
+                f"SELECT slug, content_hash FROM companies WHERE slug IN ({','.join('?' * len(part))})", part
             )
-            for c in oss_companies:
-                slug = c.get("slug", "")
-                if slug:
-                    merged[slug] = normalize_oss(c, batch)
-            for c in yc_companies:
-                slug = c.get("slug", "")
-                if slug:
-                    existing = merged.get(slug, {})
-                    normalized = normalize_yc(c, batch)
-                    # YC API overwrites but keep longer descriptions
-                    if existing.get("long_description") and not normalized["long_description"]:
-                        normalized["long_description"] = existing["long_description"]
-                    if existing.get("logo_url") and not normalized["logo_url"]:
-                        normalized["logo_url"] = existing["logo_url"]
-                    merged[slug] = normalized
-
-    print(f"[scraper] Total unique companies: {len(merged)}")
-
-    db = await get_db()
-    await db.execute("DELETE FROM companies")
-    for slug, c in merged.items():
-        if not c["name"] or not c["slug"]:
-            continue
-        await db.execute("""
-            INSERT OR REPLACE INTO companies 
-            (name, slug, website, one_liner, long_description, team_size, batch, status, industries, tags, locations, is_hiring, logo_url, yc_url)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            c["name"], c["slug"], c["website"], c["one_liner"], c["long_description"],
-            c["team_size"], c["batch"], c["status"], c["industries"], c["tags"],
-            c["locations"], c["is_hiring"], c["logo_url"], c["yc_url"]
-        ))
-    await db.commit()
-    await db.close()
-    return len(merged)
+            stored.update((r["slug"], r["content_hash"]) for r in await cursor.fetchall())
+
+        for c in companies:
+            digest = company_hash(c)
+            row = [c[f] for f in COMPANY_FIELDS] + [digest]
+            if c["slug"] not in stored:
+                inserts.append(row)
+            elif stored[c["slug"]] != digest:
+                updates.append(row[1:] + [c["slug"]])  # slug is the match key, not updated
+            else:
+                unchanged += 1
+
+        if inserts:
+            await db.executemany(
+                f"INSERT INTO companies ({columns}, content_hash) VALUES ({', '.join('?' * (len(COMPANY_FIELDS) + 1))})",
+                inserts,
+            )
+        if updates:
+            assignments = ", ".join(f"{f} = ?" for f in COMPANY_FIELDS[1:])
+            await db.executemany(f"UPDATE companies SET {assignments}, content_hash = ?, features = NULL WHERE slug = ?", updates)
+
+        if inserts or updates:
+            changed_slugs = [r[0] for r in inserts] + [r[-1] for r in updates]
+            for i in range(0, len(changed_slugs), 500):
+                part = changed_slugs[i:i + 500]
+                cursor = await db.execute(f"SELECT id FROM companies WHERE slug IN ({','.join('?' * len(part))})", part)
+                changed_ids.extend(r["id"] for r in await cursor.fetchall())
+            await sync_company_facets(db, changed_ids)
+
+    return {"inserted": len(inserts), "updated": len(updates), "unchanged": unchanged, "changed_ids": changed_ids}
+
+async def remove_missing(seen: dict, batches: set) -> int:
+    """Delete stored companies of `batches` whose slug is not in `seen`."""
+    if not batches:
+        return 0
+    async with db_write() as db:
+        removed = []
+        for batch in batches:
+            cursor = await db.execute("SELECT id, slug FROM companies WHERE batch = ?", (batch,))
+            removed.extend((r["id"],) for r in await cursor.fetchall() if r["slug"] not in seen)
+        if removed:
+            await db.executemany("DELETE FROM companies WHERE id = ?", removed)
+    return len(removed)
@@ -0,0 +1,116 @@
+import json
+import time
+from database import db_read, db_write, compute_stat_counters, rebuild_stat_counters
+
+# The snapshot is reused while the counter version is unchanged. The
+# follow-up list depends on the clock, so it also expires after this long.
+SNAPSHOT_MAX_AGE = 60.0
+
+_snapshot = {"version": None, "built_at": 0.0, "data": None}
+
+
+def _group(counters: dict, metric: str) -> dict:
+    return {bucket or None: value for (m, bucket), value in counters.items() if m == metric and value}
+
+
+def _scalar(counters: dict, metric: str) -> int:
+    return counters.get((metric, ""), 0)
+
+
+async def _read_counters(db) -> dict:
+    cursor = await db.execute("SELECT metric, bucket, value FROM stat_counters")
+    return {(r["metric"], r["bucket"]): r["value"] for r in await cursor.fetchall()}
+
+
+async def _build(db, counters: dict) -> dict:
+    outreach_by_status = _group(counters, "outreach_by_status")
+    total_outreach = sum(outreach_by_status.values())
+    replied = outreach_by_status.get("replied", 0) + outreach_by_status.get("interview", 0)
+    sent = outreach_by_status.get("sent", 0) + replied
+    response_rate = round((replied / sent * 100), 1) if sent > 0 else 0
+
+    # The lists are top-10 reads off indexes, not aggregates
+    cursor = await db.execute("""
+        SELECT o.*, c.name as company_name, c.batch as company_batch
+        FROM outreach o JOIN companies c ON c.id = o.company_id
+        ORDER BY o.updated_at DESC LIMIT 10
+    """)
+    recent = [dict(r) for r in await cursor.fetchall()]
+
+    cursor = await db.execute("""
+        SELECT o.*, c.name as company_name, c.batch as company_batch
+        FROM outreach o JOIN companies c ON c.id = o.company_id
+        WHERE o.status = 'sent' AND datetime(o.sent_at) < datetime('now', '-3 days')
+        ORDER BY datetime(o.sent_at) ASC LIMIT 10
+    """)
+    follow_ups = [dict(r) for r in await cursor.fetchall()]
+
+    cursor = await db.execute("""
+        SELECT id, name, slug, one_liner, batch, relevance_score, is_hiring, logo_url, industries, locations
+        FROM companies WHERE relevance_score > 0
+        ORDER BY relevance_score DESC LIMIT 10
+    """)
+    top_matches = []
+    for r in await cursor.fetchall():
+        d = dict(r)
+        for field in ["industries", "locations"]:
+            try:
+                d[field] = json.loads(d[field]) if d[field] else []
+            except:
+                d[field] = []
+        top_matches.append(d)
+
+    contacts_by_source = _group(counters, "contacts_by_source")
+    return {
+        "total_companies": _scalar(counters, "companies"),
+        "ai_companies": _scalar(counters, "companies_ai"),
+        "hiring_companies": _scalar(counters, "companies_hiring"),
+        "by_batch": dict(sorted(_group(counters, "companies_by_batch").items(), key=lambda kv: kv[0] or "")),
+        "outreach_by_status": outreach_by_status,
+        "total_outreach": total_outreach,
+        "response_rate": response_rate,
+        "recent_activity": recent,
+        "needs_follow_up": follow_ups,
+        "companies_scored": _scalar(counters, "companies_scored"),
+        "recon_contacts": contacts_by_source.get("recon_agent", 0),
+        "top_matches": top_matches,
+        "contacts_by_source": contacts_by_source,
+        "total_contacts": _scalar(counters, "contacts"),
+    }
+
+
+async def get_dashboard_stats() -> dict:
+    """Dashboard payload. One indexed read when nothing changed since the last call."""
+    async with db_read() as db:
+        cursor = await db.execute("""
+            SELECT (SELECT value FROM stat_counters WHERE metric = 'version' AND bucket = '') AS version,
+                   (SELECT MAX(created_at) FROM agent_logs) AS last_agent_run
+        """)
+        row = await cursor.fetchone()
+        fresh = time.monotonic() - _snapshot["built_at"] < SNAPSHOT_MAX_AGE
+        if _snapshot["data"] is None or _snapshot["version"] != row["version"] or not fresh:
+            counters = await _read_counters(db)
+            _snapshot.update(
+                version=counters.get(("version", "")),
+                built_at=time.monotonic(),
+                data=await _build(db, counters),
+            )
+    return {**_snapshot["data"], "last_agent_run": row["last_agent_run"]}
+
+
+async def check_stats(repair: bool = False) -> dict:
+    """Compare the stored counters with a full recount; optionally rebuild them."""
+    async with db_read() as db:
+        stored = await _read_counters(db)
+        actual = await compute_stat_counters(db)
+    stored.pop(("version", ""), None)
+    drift = {}
+    for key in set(stored) | set(actual):
+        have, want = stored.get(key, 0), actual.get(key, 0)
+        if have != want:
+            metric, bucket = key
+            drift[f"{metric}:{bucket}" if bucket else metric] = {"stored": have, "actual": want}
+    if drift and repair:
+        async with db_write() as db:
+            await rebuild_stat_counters(db)
+    return {"consistent": not drift, "drift": drift, "repaired": bool(drift and repair)}
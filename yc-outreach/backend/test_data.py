@@ -1,21 +1,19 @@
 import asyncio
 import json
-from database import init_db, get_db
+from database import init_db, db_read, db_write, close_pool
 
 async def add_test_companies():
     print("Initializing database...")
     await init_db()
     
-    db = await get_db()
-    
     print("Adding test companies...")
     # Check if we already have test data
-    cursor = await db.execute("SELECT COUNT(*) FROM companies")
-    count = (await cursor.fetchone())[0]
+    async with db_read() as db:
+        cursor = await db.execute("SELECT COUNT(*) FROM companies")
+        count = (await cursor.fetchone())[0]
     
     if count > 0:
         print(f"Database already has {count} companies. Skipping test data.")
-        await db.close()
         return
     
     # Add some test companies
@@ -67,50 +65,55 @@ async def add_test_companies():
         }
     ]
     
-    for company in test_companies:
-        await db.execute("""
-            INSERT INTO companies 
-            (name, slug, website, one_liner, long_description, team_size, batch, status, industries, tags, locations, is_hiring, relevance_score)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            company["name"], company["slug"], company["website"], company["one_liner"], company["long_description"],
-            company["team_size"], company["batch"], company["status"], company["industries"], company["tags"],
-            company["locations"], company["is_hiring"], company["relevance_score"]
-        ))
+    async with db_write() as db:
+        for company in test_companies:
+            await db.execute("""
+                INSERT INTO companies 
+                (name, slug, website, one_liner, long_description, team_size, batch, status, industries, tags, locations, is_hiring, relevance_score)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                company["name"], company["slug"], company["website"], company["one_liner"], company["long_description"],
+                company["team_size"], company["batch"], company["status"], company["industries"], company["tags"],
+                company["locations"], company["is_hiring"], company["relevance_score"]
+            ))
     
-    # Add some test contacts
-    test_contacts = [
-        {
-            "company_slug": "testai",
-            "name": "Jane Smith",
-            "role": "CEO & Co-founder",
-            "email": "jane@testai.com",
-            "source": "yc_profile"
-        },
-        {
-            "company_slug": "dataflow",
-            "name": "Michael Chen",
-            "role": "CTO & Co-founder",
-            "email": "michael@dataflow.io",
-            "source": "github"
-        }
-    ]
+        # Add some test contacts
+        test_contacts = [
+            {
+                "company_slug": "testai",
+                "name": "Jane Smith",
+                "role": "CEO & Co-founder",
+                "email": "jane@testai.com",
+                "source": "yc_profile"
+            },
+            {
+                "company_slug": "dataflow",
+                "name": "Michael Chen",
+                "role": "CTO & Co-founder",
+                "email": "michael@dataflow.io",
+                "source": "github"
+            }
+        ]
     
-    for contact in test_contacts:
-        # Get company ID
-        cursor = await db.execute("SELECT id FROM companies WHERE slug = ?", (contact["company_slug"],))
-        company = await cursor.fetchone()
-        if company:
-            company_id = company["id"]
-            await db.execute(
-                "INSERT INTO contacts (company_id, name, role, email, source) VALUES (?, ?, ?, ?, ?)",
-                (company_id, contact["name"], contact["role"], contact["email"], contact["source"])
-            )
+        for contact in test_contacts:
+            # Get company ID
+            cursor = await db.execute("SELECT id FROM companies WHERE slug = ?", (contact["company_slug"],))
+            company = await cursor.fetchone()
+            if company:
+                company_id = company["id"]
+                await db.execute(
+                    "INSERT INTO contacts (company_id, name, role, email, source) VALUES (?, ?, ?, ?, ?)",
+                    (company_id, contact["name"], contact["role"], contact["email"], contact["source"])
+                )
     
-    await db.commit()
-    await db.close()
     print("Added 3 test companies and 2 contacts to the database.")
 
+async def main():
+    try:
+        await add_test_companies()
+    finally:
+        await close_pool()
+
 if __name__ == "__main__":
-    asyncio.run(add_test_companies())
+    asyncio.run(main())
     print("Done! You can now start the application to see test data.")
\ No newline at end of file
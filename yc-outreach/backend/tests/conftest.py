@@ -0,0 +1,29 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import http_cache
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    """Run a coroutine against a fresh database and HTTP cache in tmp_path."""
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+    monkeypatch.setattr(http_cache, "CACHE_DIR", str(tmp_path / "http_cache"))
+    monkeypatch.setattr(http_cache, "_caches", {})
+
+    def run(coro):
+        async def main():
+            try:
+                await database.init_db()
+                return await coro
+            finally:
+                await database.close_pool()
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,26 @@
+from database import db_read, db_write
+from draft_cache import DraftCache
+
+
+async def drafts_of_twins():
+    """Two companies with identical draft inputs, then a change to one of them."""
+    async with db_write() as db:
+        for slug in ("acme", "acme-2"):
+            await db.execute("INSERT INTO companies (name, slug, one_liner, batch, team_size) "
+                             "VALUES ('Acme', ?, 'Payroll for robots', 'W24', 5)", (slug,))
+    async with db_read() as db:
+        cursor = await db.execute("SELECT * FROM companies ORDER BY id")
+        first, second = [dict(r) for r in await cursor.fetchall()]
+    cache = DraftCache()
+    emails = await cache.get(first)
+    assert await cache.get(second) == emails
+    async with db_write() as db:
+        await db.execute("UPDATE companies SET one_liner = 'Payroll for people' WHERE id = ?", (first["id"],))
+    async with db_read() as db:
+        cursor = await db.execute("SELECT company_id FROM email_drafts")
+        return [r[0] for r in await cursor.fetchall()], second["id"]
+
+
+def test_rows_are_per_company(run):
+    kept, second_id = run(drafts_of_twins())
+    assert kept == [second_id]
@@ -0,0 +1,30 @@
+import time
+
+import jobs
+from database import db_read, db_write
+
+
+async def restart_with_held_lock():
+    """A scout job whose lock a previous process still holds, then a restart's recovery."""
+    async with db_write() as db:
+        await db.execute("INSERT INTO jobs (id, kind, target, status, created_at) "
+                         "VALUES ('old', 'agent', 'scout', 'running', '2026-01-01')")
+        await db.execute("INSERT INTO run_locks (name, holder, owner, acquired_at, expires_at) "
+                         "VALUES ('scout', 'old', 'dead-process', '2026-01-01', ?)", (time.time() + 30,))
+    try:
+        await jobs.recover_jobs()
+        async with db_read() as db:
+            cursor = await db.execute("SELECT status FROM jobs WHERE id = 'old'")
+            status = (await cursor.fetchone())[0]
+        return status, await jobs.lock_holder("scout")
+    finally:
+        await jobs.close_jobs()
+
+
+def test_restart_releases_locks(run):
+    assert run(restart_with_held_lock()) == ("failed", None)
+
+
+def test_shared_locks_wait_for_lease(run, monkeypatch):
+    monkeypatch.setattr(jobs, "SHARED_RUN_LOCKS", True)
+    assert run(restart_with_held_lock()) == ("running", "old")
@@ -0,0 +1,31 @@
+import json
+
+import database
+import scraper
+from database import db_read, db_write
+
+
+def test_oss_location_string_is_split():
+    company = scraper.normalize_oss({"name": "Acme", "slug": "acme", "all_locations": "New York, NY, USA; Remote"}, "W24")
+    assert json.loads(company["locations"]) == ["New York, NY, USA", "Remote"]
+
+
+def test_stored_location_string_is_backfilled(run):
+    async def check():
+        async with db_write() as db:
+            await db.execute(
+                "INSERT INTO companies (name, slug, batch, locations) VALUES ('Acme', 'acme', 'W24', ?)",
+                (json.dumps("New York, NY, USA; Remote"),),
+            )
+        await database.init_db()
+        async with db_read() as db:
+            cursor = await db.execute("SELECT * FROM companies WHERE slug = 'acme'")
+            company = dict(await cursor.fetchone())
+            cursor = await db.execute("SELECT location FROM company_locations WHERE company_id = ? ORDER BY location",
+                                      (company["id"],))
+            facets = [r[0] for r in await cursor.fetchall()]
+        return company, facets
+
+    company, facets = run(check())
+    assert json.loads(company["locations"]) == ["New York, NY, USA", "Remote"]
+    assert facets == ["New York, NY, USA", "Remote"]
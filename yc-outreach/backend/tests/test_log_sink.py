@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+from database import db_read, db_write
+from log_sink import AGENT_LOG_RETENTION_DAYS, compact_agent_logs
+
+
+async def add_runs(days_ago):
+    """One scout run per entry of `days_ago`, each a start row and a finish row."""
+    async with db_write() as db:
+        for days in days_ago:
+            created = (datetime.utcnow() - timedelta(days=days)).isoformat()
+            for action in ("start", "scoring_complete"):
+                await db.execute("INSERT INTO agent_logs (agent_name, action, created_at) VALUES ('scout', ?, ?)",
+                                 (action, created))
+
+
+async def log_count():
+    async with db_read() as db:
+        cursor = await db.execute("SELECT COUNT(*) FROM agent_logs")
+        return (await cursor.fetchone())[0]
+
+
+def test_retention_is_opt_in(run):
+    async def check():
+        await add_runs([90, 60, 1])
+        unset = await compact_agent_logs()
+        count = await log_count()
+        explicit = await compact_agent_logs(30)
+        return unset, count, explicit, await log_count()
+
+    unset, count, explicit, compacted = run(check())
+    assert AGENT_LOG_RETENTION_DAYS == 0
+    assert unset == {"runs": 0, "removed": 0} and count == 6
+    assert explicit["runs"] == 2 and compacted == 4
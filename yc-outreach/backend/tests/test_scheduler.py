@@ -0,0 +1,25 @@
+from datetime import datetime
+
+import pytest
+
+import scheduler
+
+AGENTS = ["scout", "recon", "writer", "tracker", "all"]
+
+
+def test_off_unless_configured(monkeypatch):
+    monkeypatch.delenv("AGENT_SCHEDULE", raising=False)
+    assert scheduler.load_schedule(AGENTS) == {}
+
+
+def test_configured_schedule(monkeypatch):
+    monkeypatch.setenv("AGENT_SCHEDULE", "scout=0 6 * * *;recon=30 6 * * *;tracker=0 * * * *")
+    schedule = scheduler.load_schedule(AGENTS)
+    assert list(schedule) == ["scout", "recon", "tracker"]
+    assert schedule["recon"].next_after(datetime(2026, 10, 17, 13, 7)) == datetime(2026, 10, 18, 6, 30)
+
+
+def test_unknown_agent_fails_at_load(monkeypatch):
+    monkeypatch.setenv("AGENT_SCHEDULE", "scuot=0 6 * * *")
+    with pytest.raises(ValueError, match="scuot"):
+        scheduler.load_schedule(AGENTS)
@@ -0,0 +1,64 @@
+import json
+
+from scoring import score_company
+
+
+def old_score(c: dict) -> int:
+    """ScoutAgent._score before scoring.py, for comparison."""
+    score = 0
+    text = " ".join([c.get("industries") or "", c.get("tags") or "",
+                     c.get("one_liner") or "", c.get("long_description") or ""]).lower()
+    ai_keywords = ["artificial intelligence", "machine learning", "deep learning", "nlp",
+                   "natural language", "llm", "large language model", "computer vision",
+                   "neural network", "generative ai", "\"ai\"", " ai ", " ai,", " ml ",
+                   "ai-", "ml-", "ai/ml"]
+    if any(k in text for k in ai_keywords):
+        score += 30
+    if c.get("is_hiring"):
+        score += 20
+    locs = (c.get("locations") or "").lower()
+    if any(k in locs for k in ["nyc", "new york", "remote"]):
+        score += 15
+    ts = c.get("team_size") or 0
+    if 2 <= ts <= 50:
+        score += 10
+    infra_keywords = ["developer tools", "devtools", "infrastructure", "saas", "platform",
+                      "api", "sdk", "cloud", "dev tool"]
+    if any(k in text for k in infra_keywords):
+        score += 5
+    return score
+
+
+def company(one_liner="", industries=(), tags=(), locations=(), is_hiring=0, team_size=0, long_description=""):
+    return {"one_liner": one_liner, "long_description": long_description, "industries": json.dumps(list(industries)),
+            "tags": json.dumps(list(tags)), "locations": json.dumps(list(locations)),
+            "is_hiring": is_hiring, "team_size": team_size}
+
+
+FIXTURES = [
+    company("LLM observability for developers", ["B2B"], ["Developer Tools"], ["San Francisco, CA, USA"], 1, 12),
+    company("Payroll for restaurants", ["Fintech"], ["SaaS"], ["New York, NY, USA"], 0, 80),
+    company("Clinic scheduling", ["Healthcare"], ["AI"], ["Remote"], 1, 1),
+    company("Robots that fold laundry", ["Hardware"], ["Robotics"], ["New York, NY, USA", "Remote"], 0, 30),
+    company("Open-source database", [], ["Infrastructure"], [], 1, 50, "Deep learning on your tables."),
+    company("Marketplace for used bikes", ["Consumer"], [], ["London, UK"], 0, 3),
+    company("Ai-native CRM", [], [], ["Austin, TX, USA; Remote"], 0, 2),
+]
+
+
+def test_matches_old_formula():
+    for c in FIXTURES:
+        assert score_company(c) == old_score(c), c["one_liner"]
+
+
+def test_string_locations():
+    c = company("Payroll for restaurants", team_size=80)
+    c["locations"] = json.dumps("Austin, TX, USA; Remote")
+    assert score_company(c) == old_score(c) == 15
+
+
+def test_ai_facets_count_as_ai():
+    # Deliberate change: every AI_FACETS value earns the AI bonus, as in the dashboard's AI count;
+    # the old substring test missed tags like "AI Assistant"
+    c = company("Data explorer for the US economy", ["Analytics"], ["AI Assistant"], [], 0, 5)
+    assert score_company(c) == old_score(c) + 30
@@ -0,0 +1,62 @@
+import httpx
+
+import scraper
+from database import db_read, db_write
+
+REAL_CLIENT = httpx.AsyncClient
+COMPANIES = [{"name": f"Company {i}", "slug": f"company-{i}", "batch": "W24"} for i in range(6)]
+
+
+def mock_client(monkeypatch, handler):
+    monkeypatch.setattr(scraper.httpx, "AsyncClient",
+                        lambda **kw: REAL_CLIENT(transport=httpx.MockTransport(handler), **kw))
+
+
+def yc_pages(pages, fail_page=None):
+    """Serve `pages` (lists of companies) from the YC API, a 500 for `fail_page`, 404 from yc-oss."""
+    def handler(request):
+        if request.url.host != "api.ycombinator.com":
+            return httpx.Response(404)
+        page = int(request.url.params["page"])
+        if page == fail_page:
+            return httpx.Response(500)
+        return httpx.Response(200, json=pages[page] if page < len(pages) else [])
+    return handler
+
+
+async def counts():
+    async with db_read() as db:
+        result = {}
+        for table in ("companies", "contacts", "outreach"):
+            cursor = await db.execute(f"SELECT COUNT(*) FROM {table}")
+            result[table] = (await cursor.fetchone())[0]
+        return result
+
+
+def test_failed_page_removes_nothing(run, monkeypatch):
+    mock_client(monkeypatch, yc_pages([COMPANIES[:2], COMPANIES[2:]]))
+    assert run(scraper.scrape_all(["W24"]))["inserted"] == 6
+
+    async def add_outreach():
+        async with db_write() as db:
+            cursor = await db.execute("SELECT id FROM companies WHERE slug = 'company-5'")
+            company_id = (await cursor.fetchone())[0]
+            cursor = await db.execute("INSERT INTO contacts (company_id, name, source) VALUES (?, 'Ann', 'manual')",
+                                      (company_id,))
+            await db.execute("INSERT INTO outreach (company_id, contact_id, status) VALUES (?, ?, 'sent')",
+                             (company_id, cursor.lastrowid))
+    run(add_outreach())
+
+    # Page 1 fails on the rescrape: only page 0's companies come back
+    mock_client(monkeypatch, yc_pages([COMPANIES[:2], COMPANIES[2:]], fail_page=1))
+    result = run(scraper.scrape_all(["W24"]))
+    assert result["removed"] == 0
+    assert run(counts()) == {"companies": 6, "contacts": 1, "outreach": 1}
+
+
+def test_complete_batch_removes_missing(run, monkeypatch):
+    mock_client(monkeypatch, yc_pages([COMPANIES]))
+    run(scraper.scrape_all(["W24"]))
+    mock_client(monkeypatch, yc_pages([COMPANIES[:4]]))
+    assert run(scraper.scrape_all(["W24"]))["removed"] == 2
+    assert run(counts())["companies"] == 4
@@ -45,4 +45,18 @@ export const api = {
     return request(`/agents/logs?${qs}`)
   },
   getAgentStatus: () => request('/agents/status'),
+  // Live log/progress/job events; EventSource resumes with Last-Event-ID on its own
+  streamAgents: () => new EventSource(`${API}/agents/stream`),
+
+  // Background jobs (scrape and agent runs return a job right away)
+  getJob: (id) => request(`/jobs/${id}`),
+  cancelJob: (id) => request(`/jobs/${id}/cancel`, { method: 'POST' }),
+  waitForJob: async (id, onPoll, interval = 1500) => {
+    for (;;) {
+      const job = await request(`/jobs/${id}`)
+      onPoll?.(job)
+      if (!['queued', 'running'].includes(job.status)) return job
+      await new Promise(r => setTimeout(r, interval))
+    }
+  },
 }
@@ -24,6 +24,18 @@ const BG_COLORS = {
   amber: 'bg-amber-500/10 text-amber-400',
 }
 
+// One line out of the merged progress events of the running job
+const progressText = (p) => {
+  const parts = []
+  if (p.stage) parts.push(p.stage)
+  if (p.batches_total) parts.push(`${p.batches_done || 0}/${p.batches_total} batches`)
+  if (p.companies_total) parts.push(`${p.companies_done || 0}/${p.companies_total} companies`)
+  if (p.contacts_found != null) parts.push(`${p.contacts_found} contacts`)
+  if (p.source) parts.push(`${p.source}: ${p.company}`)
+  if (p.eta_s != null) parts.push(`ETA ${p.eta_s}s`)
+  return parts.join(' · ')
+}
+
 const DOT_COLORS = {
   scout: 'bg-blue-500',
   recon: 'bg-purple-500',
@@ -37,6 +49,7 @@ export default function Agents() {
   const [logs, setLogs] = useState([])
   const [logFilter, setLogFilter] = useState(null)
   const [running, setRunning] = useState(null) // agent key or 'all'
+  const [progress, setProgress] = useState({})
   const [loading, setLoading] = useState(true)
   const { addToast } = useToast()
   const logEndRef = useRef(null)
@@ -58,20 +71,35 @@ export default function Agents() {
 
   useEffect(() => { fetchData() }, [logFilter])
 
+  // New log lines and progress arrive over SSE instead of by polling the log endpoint
+  useEffect(() => {
+    const es = api.streamAgents()
+    es.addEventListener('log', (e) => {
+      const log = JSON.parse(e.data)
+      if (logFilter && log.agent_name !== logFilter) return
+      setLogs(prev => [{ ...log, id: `live-${e.lastEventId}` }, ...prev].slice(0, 100))
+    })
+    es.addEventListener('progress', (e) => {
+      const fields = JSON.parse(e.data)
+      setProgress(prev => ({ ...prev, ...fields }))
+    })
+    // Missed more than the server buffers: reload instead
+    es.addEventListener('reset', () => fetchData())
+    return () => es.close()
+  }, [logFilter])
+
   useEffect(() => {
     logEndRef.current?.scrollIntoView({ behavior: 'smooth' })
   }, [logs])
 
   const runAgent = async (key) => {
     setRunning(key)
+    setProgress({})
     try {
-      if (key === 'all') {
-        await api.runAllAgents()
-        addToast('Pipeline complete')
-      } else {
-        await api.runAgent(key)
-        addToast(`${key} agent complete`)
-      }
+      const job = key === 'all' ? await api.runAllAgents() : await api.runAgent(key)
+      const done = await api.waitForJob(job.id)
+      if (done.status !== 'succeeded') throw new Error(done.error || `job ${done.status}`)
+      addToast(key === 'all' ? 'Pipeline complete' : `${key} agent complete`)
       await fetchData()
     } catch (e) {
       addToast(`Agent error: ${e.message}`, 'error')
@@ -112,6 +140,9 @@ export default function Agents() {
           Run All Agents
         </button>
       </div>
+      {running && progressText(progress) && (
+        <p className="text-xs text-zinc-500 -mt-4 mb-4">{progressText(progress)}</p>
+      )}
 
       {/* Pipeline Visualization */}
       <div className="card mb-6">
@@ -25,7 +25,7 @@ export default function Companies() {
       if (search) params.search = search
       if (selectedBatches.length) params.batch = selectedBatches.join(',')
       if (hiringOnly) params.is_hiring = true
-      if (aiOnly) params.industry = 'AI'
+      if (aiOnly) params.tag = 'AI,Artificial Intelligence,Machine Learning,Generative AI'
       if (sortRelevance) params.sort_by = 'relevance'
       const data = await api.getCompanies(params)
       setCompanies(data.companies)